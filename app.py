@@ -6,14 +6,12 @@ Pestañas: Configuración y búsqueda
 
 import streamlit as st
 import pandas as pd
-from scraper import scrape_discos_paradiso, get_available_styles
-from utils import apply_custom_css, render_header
+from utils import apply_custom_css, render_header, sum_prices, df_to_csv_bytes, count_with_text
 from auth_module import check_auth, get_current_user_id, get_current_user_email
 from data_storage import (
     load_data, save_data, add_discos, get_all_discos, 
-    get_estilos_info, get_ultima_actualizacion
+    get_estilos_info, get_estilos_universe, get_ultima_actualizacion
 )
-from rekordbox_module import find_matches_with_progress, render_progress_animation, parse_rekordbox_txt
 from datetime import datetime
 import time
 
@@ -49,17 +47,18 @@ all_discos_df = get_all_discos(user_id)
 estilos_info = get_estilos_info(user_id)
 ultima_actualizacion = get_ultima_actualizacion(user_id)
 
-# Cargar Rekordbox guardado
+# Cargar Rekordbox guardado (la pestaña Rekordbox ya lo persiste al subirlo)
+# Solo se vuelve a leer cuando cambia la fecha de carga guardada
 from data_storage import get_rekordbox, get_rekordbox_fecha
-rekordbox_df = get_rekordbox(user_id)
 rekordbox_fecha = get_rekordbox_fecha(user_id)
-
-# Si hay Rekordbox en session state (recién cargado), guardarlo
-if 'rekordbox_df' in st.session_state and st.session_state['rekordbox_df'] is not None:
+rekordbox_cache_key = (user_id, rekordbox_fecha)
+if st.session_state.get('rekordbox_cache_key') != rekordbox_cache_key:
+    st.session_state['rekordbox_df_cached'] = get_rekordbox(user_id)
+    st.session_state['rekordbox_cache_key'] = rekordbox_cache_key
+rekordbox_df = st.session_state['rekordbox_df_cached']
+# Si no se pudo guardar (o no hay almacenamiento), usar la lista recién subida en esta sesión
+if (rekordbox_df is None or rekordbox_df.empty) and st.session_state.get('rekordbox_df') is not None:
     rekordbox_df = st.session_state['rekordbox_df']
-    from data_storage import save_rekordbox
-    save_rekordbox(rekordbox_df, user_id)
-    rekordbox_fecha = get_rekordbox_fecha(user_id)
 
 # ==================== DASHBOARD PRINCIPAL ====================
 # Métricas principales en grid compacto
@@ -81,9 +80,9 @@ with col2:
         
 with col3:
     if ultima_actualizacion:
-        fecha = datetime.fromisoformat(ultima_actualizacion).strftime("%d/%m/%Y %H:%M")
-        st.metric("🕐 Última Actualización", fecha.split()[0], 
-                 delta=f"{fecha.split()[1]}")
+        fecha = datetime.fromisoformat(ultima_actualizacion)
+        st.metric("🕐 Última Actualización", fecha.strftime("%d/%m/%Y"), 
+                 delta=fecha.strftime("%H:%M"))
     else:
         st.metric("🕐 Última Actualización", "Nunca", 
                  delta="Ejecutar búsqueda", delta_color="off")
@@ -111,10 +110,10 @@ with tab_main:
     if estilos_info:
         col_info1, col_info2 = st.columns([3, 1])
         with col_info1:
-            estilos_text = ", ".join([", ".join(info['estilos']) for info in estilos_info.values()])
+            estilos_text = ", ".join(", ".join(info['estilos']) for info in estilos_info.values())
             st.caption(f"📊 Estilos: {estilos_text}")
         with col_info2:
-            total_discos = sum([info['total_discos'] for info in estilos_info.values()])
+            total_discos = sum(info['total_discos'] for info in estilos_info.values())
             st.caption(f"💿 Total: {total_discos} discos")
     
     # ==================== BÚSQUEDA DE COINCIDENCIAS ====================
@@ -144,9 +143,15 @@ with tab_main:
                     value=False,
                     help="Buscar cruzado"
                 )
-                if st.button("🔍 Buscar", type="primary", use_container_width=True):
-                    # Calcular total de items y tiempo estimado
-                    total_items = len(rekordbox_df) * len(all_discos_df)
+                buscar = st.button("🔍 Buscar", type="primary", use_container_width=True)
+                # Total de comparaciones (pistas × discos con artista o título);
+                # solo al buscar, para no recorrer ambas tablas en cada rerun
+                total_items = count_with_text(rekordbox_df) * count_with_text(all_discos_df) if buscar else 0
+                if buscar and total_items == 0:
+                    # Nada que comparar: no leer tiempos ni montar la animación
+                    st.warning("No hay pistas o discos que comparar.")
+                elif buscar:
+                    # Calcular tiempo estimado
                     from data_storage import get_tiempo_estimado, save_tiempo_busqueda
                     tiempo_estimado = get_tiempo_estimado(total_items, user_id)
                     
@@ -158,27 +163,55 @@ with tab_main:
                     tiempo_total = 0
                     
                     try:
-                        from rekordbox_module import find_matches_with_progress, render_progress_animation
+                        from rekordbox_module import (
+                            find_matches_with_progress, render_progress_animation, build_disc_index,
+                            can_reuse_scores, matches_from_scores
+                        )
                         
-                        for progreso, matches_parciales, tiempo_transcurrido in find_matches_with_progress(
-                            rekordbox_df, 
-                            all_discos_df,
-                            artist_threshold=artist_threshold,
-                            title_threshold=title_threshold,
-                            buscar_cruzado=buscar_cruzado
-                        ):
-                            matches_df = matches_parciales
-                            tiempo_total = tiempo_transcurrido
+                        # Índice del catálogo: solo se reconstruye si cambian los discos guardados
+                        disc_index_key = (user_id, ultima_actualizacion, len(all_discos_df))
+                        if st.session_state.get('disc_index_key') != disc_index_key:
+                            st.session_state['disc_index'] = build_disc_index(all_discos_df)
+                            st.session_state['disc_index_key'] = disc_index_key
+                        
+                        # Puntuaciones de la última búsqueda con la misma lista y catálogo:
+                        # si los umbrales solo suben, basta con refiltrar las parejas guardadas
+                        # (versión de la lista subida: la de sesión puede cambiar sin que cambie la fecha guardada)
+                        match_scores_key = (disc_index_key, st.session_state.get('rekordbox_cache_key'),
+                                            st.session_state.get('rekordbox_version'))
+                        match_scores = st.session_state.get('match_scores')
+                        if (st.session_state.get('match_scores_key') == match_scores_key and
+                                can_reuse_scores(match_scores, artist_threshold, title_threshold, buscar_cruzado)):
+                            inicio = time.time()
+                            matches_df = matches_from_scores(
+                                match_scores, st.session_state['disc_index'],
+                                artist_threshold, title_threshold
+                            )
+                            tiempo_total = time.time() - inicio
+                        else:
+                            match_scores = {}
+                            for progreso, resultado, tiempo_transcurrido in find_matches_with_progress(
+                                rekordbox_df, 
+                                all_discos_df,
+                                artist_threshold=artist_threshold,
+                                title_threshold=title_threshold,
+                                buscar_cruzado=buscar_cruzado,
+                                disc_index=st.session_state['disc_index'],
+                                scores=match_scores
+                            ):
+                                tiempo_total = tiempo_transcurrido
+                                
+                                # Actualizar animación
+                                html_animacion = render_progress_animation(progreso, tiempo_transcurrido, tiempo_estimado)
+                                progress_container.markdown(html_animacion, unsafe_allow_html=True)
                             
-                            # Actualizar animación
-                            html_animacion = render_progress_animation(progreso, tiempo_transcurrido, tiempo_estimado)
-                            progress_container.markdown(html_animacion, unsafe_allow_html=True)
+                            # La última actualización trae el DataFrame completo
+                            matches_df = resultado
+                            st.session_state['match_scores'] = match_scores
+                            st.session_state['match_scores_key'] = match_scores_key
                             
-                            # Pequeña pausa para que se vea la animación
-                            time.sleep(0.05)
-                        
-                        # Guardar tiempo de búsqueda
-                        save_tiempo_busqueda(tiempo_total, total_items, user_id)
+                            # Guardar tiempo de búsqueda (solo de búsquedas completas)
+                            save_tiempo_busqueda(tiempo_total, total_items, user_id)
                         
                         # Limpiar animación y mostrar resultados
                         progress_container.empty()
@@ -192,11 +225,7 @@ with tab_main:
                                 porcentaje = (len(matches_df) / len(rekordbox_df)) * 100
                                 st.metric("% de tu lista", f"{porcentaje:.1f}%")
                             with col3:
-                                total_precio = sum([
-                                    float(str(precio).replace('€', '').replace(',', '.')) 
-                                    for precio in matches_df['precio'] 
-                                    if precio != 'N/A' and '€' in str(precio)
-                                ])
+                                total_precio = float(matches_df['precio_num'].sum())
                                 st.metric("Precio Total", f"{total_precio:.0f}€")
                             with col4:
                                 estilos_unicos = matches_df['estilos'].nunique() if 'estilos' in matches_df.columns else 0
@@ -230,7 +259,8 @@ with tab_main:
                             )
                             
                             # Botón de descarga
-                            csv = matches_df.to_csv(index=False).encode('utf-8-sig')
+                            # precio_num es interno (métricas): el CSV mantiene las columnas de siempre
+                            csv = df_to_csv_bytes(matches_df.drop(columns=['precio_num'], errors='ignore'))
                             st.download_button(
                                 label="📥 Descargar Coincidencias (CSV)",
                                 data=csv,
@@ -264,11 +294,7 @@ with tab_main:
                                 porcentaje = (len(matches_df) / len(rekordbox_df)) * 100
                                 st.metric("% de tu lista", f"{porcentaje:.1f}%")
                             with col3:
-                                total_precio = sum([
-                                    float(str(precio).replace('€', '').replace(',', '.')) 
-                                    for precio in matches_df['precio'] 
-                                    if precio != 'N/A' and '€' in str(precio)
-                                ])
+                                total_precio = sum_prices(matches_df['precio'])
                                 st.metric("Precio Total", f"{total_precio:.0f}€")
                             with col4:
                                 estilos_unicos = matches_df['estilos'].nunique() if 'estilos' in matches_df.columns else 0
@@ -300,7 +326,8 @@ with tab_main:
                             )
                             
                             # Botón de descarga
-                            csv = matches_df.to_csv(index=False).encode('utf-8-sig')
+                            # precio_num es interno (métricas): el CSV mantiene las columnas de siempre
+                            csv = df_to_csv_bytes(matches_df.drop(columns=['precio_num'], errors='ignore'))
                             st.download_button(
                                 label="📥 Descargar Coincidencias (CSV)",
                                 data=csv,
@@ -320,6 +347,8 @@ with tab_main:
 
 # ==================== PESTAÑA 2: BUSCAR DISCOS ====================
 with tab_discos:
+    from scraper import scrape_discos_paradiso, get_available_styles
+    
     # Layout compacto
     col_filters, col_results = st.columns([1, 2], gap="medium")
     
@@ -391,16 +420,9 @@ with tab_discos:
         with col1:
             # Filtro por estilos
             if 'estilos' in all_discos_df.columns:
-                estilos_unicos = set()
-                for estilos_str in all_discos_df['estilos']:
-                    if isinstance(estilos_str, list):
-                        estilos_unicos.update(estilos_str)
-                    elif isinstance(estilos_str, str):
-                        estilos_unicos.update([e.strip() for e in estilos_str.split(',')])
-                
                 estilo_filtro = st.multiselect(
                     "Estilos",
-                    options=sorted(estilos_unicos),
+                    options=get_estilos_universe(user_id),
                     default=[],
                     help="Filtrar por estilos"
                 )
@@ -423,18 +445,19 @@ with tab_discos:
         
         if estilo_filtro:
             # Filtrar por estilos
-            mask = discos_filtrados['estilos'].apply(
-                lambda x: any(estilo in str(x) for estilo in estilo_filtro)
-            )
+            # Comparación exacta por conjunto ("Techno" ya no coincide con "Dub Techno")
+            filtro_set = set(estilo_filtro)
+            mask = discos_filtrados['estilos'].map(
+                lambda x: not filtro_set.isdisjoint(
+                    x if isinstance(x, list) else [e.strip() for e in str(x).split(',')]
+                )
+            ).astype(bool)
             discos_filtrados = discos_filtrados[mask]
         
         if busqueda_texto:
             # Filtrar por texto
             busqueda_lower = busqueda_texto.lower()
-            mask = (
-                discos_filtrados['artista'].astype(str).str.lower().str.contains(busqueda_lower, na=False) |
-                discos_filtrados['titulo'].astype(str).str.lower().str.contains(busqueda_lower, na=False)
-            )
+            mask = discos_filtrados['search_blob'].str.contains(busqueda_lower, regex=False, na=False)
             discos_filtrados = discos_filtrados[mask]
         
         # Mostrar tabla compacta
@@ -449,8 +472,10 @@ with tab_discos:
             # Formatear fechas
             discos_display = discos_filtrados[display_cols].copy()
             if 'fecha_busqueda' in discos_display.columns:
-                discos_display['fecha_busqueda'] = discos_display['fecha_busqueda'].apply(
-                    lambda x: datetime.fromisoformat(x).strftime("%d/%m/%Y %H:%M") if pd.notna(x) else "N/A"
+                discos_display['fecha_busqueda'] = (
+                    pd.to_datetime(discos_display['fecha_busqueda'], errors='coerce', format='ISO8601')
+                    .dt.strftime("%d/%m/%Y %H:%M")
+                    .fillna("N/A")
                 )
             
             st.dataframe(
@@ -467,7 +492,7 @@ with tab_discos:
             )
             
             # Botón de descarga compacto
-            csv_filtrado = discos_filtrados[['artista', 'titulo', 'precio', 'estilos']].to_csv(index=False).encode('utf-8-sig')
+            csv_filtrado = df_to_csv_bytes(discos_filtrados[['artista', 'titulo', 'precio', 'estilos']])
             st.download_button(
                 label="📥 Descargar CSV",
                 data=csv_filtrado,
@@ -492,7 +517,7 @@ with tab_spotify:
 with tab_local:
     try:
         from local_music import render_local_music_tab
-        render_local_music_tab()
+        render_local_music_tab(user_id)
     except ImportError:
         st.info("🔧 Módulo en desarrollo")
 
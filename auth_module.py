@@ -2,6 +2,7 @@
 Módulo de autenticación con Google OAuth
 """
 
+import functools
 import streamlit as st
 from google.oauth2 import id_token
 from google.auth.transport import requests
@@ -9,12 +10,14 @@ import os
 from data_storage import get_user_id
 
 # Obtener client_id desde secrets o variable de entorno
+@functools.lru_cache(maxsize=1)
 def get_google_client_id():
-    """Obtiene el Client ID de Google desde secrets o variable de entorno"""
+    """Obtiene el Client ID de Google desde secrets o variable de entorno (una vez por proceso)"""
     try:
         # Intentar desde Streamlit secrets (para producción)
         return st.secrets["google_oauth"]["client_id"]
-    except:
+    except (KeyError, FileNotFoundError):
+        # FileNotFoundError cubre también StreamlitSecretNotFoundError (sin secrets.toml)
         # Intentar desde variable de entorno (para desarrollo)
         return os.getenv("GOOGLE_CLIENT_ID", "")
 
@@ -3,47 +3,381 @@ Módulo para almacenar y gestionar datos persistentes
 Aislamiento de datos por usuario
 """
 
+import copy
+import functools
 import json
 import os
 from datetime import datetime
 from typing import Dict, List, Optional
+import numpy as np
 import pandas as pd
 import hashlib
+import streamlit as st
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+from utils import normalize_text, add_normalized_columns, parse_price
 
 
 DATA_DIR = "data"
 USERS_DIR = os.path.join(DATA_DIR, "users")
 
 
+@functools.lru_cache(maxsize=1024)
 def get_user_id(email: str) -> str:
     """Genera un ID único para el usuario basado en su email"""
     return hashlib.md5(email.encode()).hexdigest()
 
 
-def get_user_data_file(user_id: str) -> str:
-    """Obtiene la ruta del archivo de datos del usuario"""
+# Cada sección de los datos del usuario se guarda en su propio archivo,
+# así una escritura pequeña (p. ej. un tiempo de búsqueda) no reescribe todo
+_SECTIONS = {
+    "estilos": "estilos.json",
+    "ultima_actualizacion": "ultima_actualizacion.json",
+    "rekordbox_fecha": "rekordbox_fecha.json",
+    "tiempos_busqueda": "tiempos.json",
+}
+
+# Las secciones tabulares (una fila por disco / pista) se guardan en Parquet
+_TABLES = {
+    "discos": "discos",
+    "rekordbox": "rekordbox.parquet",
+}
+
+# Tablas particionadas: un directorio con un Parquet por valor de la columna.
+# Reemplazar los discos de un estilo reescribe solo su archivo, no la tabla entera
+_PARTITION_BY = {
+    "discos": "estilos_key",
+}
+
+# Compresión de los archivos Parquet: zstd nivel 3 reduce mucho el tamaño de las
+# columnas de texto y se descomprime más rápido de lo que se lee del disco
+PARQUET_COMPRESSION = "zstd"
+PARQUET_COMPRESSION_LEVEL = 3
+
+# Archivo único de versiones anteriores (se divide en secciones al leerlo)
+LEGACY_DATA_FILE = "no_techno_data.json"
+
+# Credenciales de Spotify: archivo propio, fuera de los datos generales del usuario
+SPOTIFY_CREDS_FILE = "spotify.json"
+
+
+def get_user_data_dir(user_id: str) -> str:
+    """Obtiene el directorio de datos del usuario"""
     user_dir = os.path.join(USERS_DIR, user_id)
     os.makedirs(user_dir, exist_ok=True)
-    return os.path.join(user_dir, "no_techno_data.json")
+    return user_dir
 
 
-def load_data(user_id: str) -> Dict:
-    """Carga los datos guardados del usuario"""
-    data_file = get_user_data_file(user_id)
-    if os.path.exists(data_file):
+def get_user_data_file(user_id: str) -> str:
+    """Obtiene la ruta del archivo de datos antiguo (único) del usuario"""
+    return os.path.join(get_user_data_dir(user_id), LEGACY_DATA_FILE)
+
+
+def _section_path(user_id: str, key: str) -> str:
+    """Obtiene la ruta del archivo de una sección"""
+    return os.path.join(get_user_data_dir(user_id), _TABLES.get(key) or _SECTIONS[key])
+
+
+def _creds_path(user_id: str) -> str:
+    """Obtiene la ruta del archivo de credenciales de Spotify"""
+    return os.path.join(get_user_data_dir(user_id), SPOTIFY_CREDS_FILE)
+
+
+def _migrate_creds_file(user_id: str):
+    """Mueve las credenciales de su antiguo archivo de sección (creds.json) a spotify.json"""
+    old_path = os.path.join(get_user_data_dir(user_id), "creds.json")
+    if os.path.exists(old_path) and not os.path.exists(_creds_path(user_id)):
+        os.replace(old_path, _creds_path(user_id))
+
+
+def _as_list(estilos) -> List[str]:
+    """Convierte los estilos de un disco (lista, array o texto separado por comas) en lista"""
+    if estilos is None:
+        return []
+    if isinstance(estilos, str):
+        return [e.strip() for e in estilos.split(',')]
+    return list(estilos)
+
+
+def _read_json(path: str):
+    """Lee un archivo JSON (con orjson si está disponible)"""
+    # Sin buffer intermedio: el archivo entero en una sola lectura, como bytes
+    with open(path, 'rb', buffering=0) as f:
+        raw = f.read()
+    if ORJSON_AVAILABLE:
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # Archivos antiguos escritos con json pueden contener NaN, que orjson no acepta
+            pass
+    return json.loads(raw)
+
+
+def _dumps_json(obj) -> bytes:
+    """Serializa a JSON compacto en bytes (con orjson si está disponible)"""
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+def _write_json_atomic(path: str, obj):
+    """Escribe JSON compacto en un archivo temporal y lo mueve encima del destino"""
+    tmp = path + ".tmp"
+    raw = _dumps_json(obj)
+    with open(tmp, 'wb') as f:
+        f.write(raw)
+    os.replace(tmp, path)
+
+
+def _partition_path(table_dir: str, part_key: str) -> str:
+    """Obtiene la ruta del archivo de una partición (nombre estable a partir de la clave)"""
+    return os.path.join(table_dir, hashlib.md5(part_key.encode()).hexdigest() + ".parquet")
+
+
+def _write_table_atomic(path: str, df: pd.DataFrame):
+    """Escribe un DataFrame en Parquet en un archivo temporal y lo mueve encima del destino"""
+    tmp = path + ".tmp"
+    df.to_parquet(
+        tmp, engine='pyarrow', index=False,
+        compression=PARQUET_COMPRESSION, compression_level=PARQUET_COMPRESSION_LEVEL
+    )
+    os.replace(tmp, path)
+
+
+def _migrate_legacy_file(user_id: str):
+    """Divide el archivo único antiguo en archivos por sección (solo la primera vez)"""
+    legacy_file = get_user_data_file(user_id)
+    if not os.path.exists(legacy_file):
+        return
+    try:
+        legacy = _read_json(legacy_file)
+    except (OSError, ValueError):
+        legacy = {}
+    for key in _SECTIONS:
+        if key in legacy and not os.path.exists(_section_path(user_id, key)):
+            _write_json_atomic(_section_path(user_id, key), legacy[key])
+    for key in _TABLES:
+        if legacy.get(key) and not os.path.exists(_section_path(user_id, key)):
+            _save_table(user_id, key, pd.DataFrame(legacy[key]))
+    if legacy.get("spotify_credentials") and not os.path.exists(_creds_path(user_id)):
+        _write_json_atomic(_creds_path(user_id), legacy["spotify_credentials"])
+    os.replace(legacy_file, legacy_file + ".migrated")
+
+
+def _migrate_discos_table(user_id: str):
+    """Divide el Parquet único de discos de versiones anteriores en particiones por estilo"""
+    old_path = os.path.join(get_user_data_dir(user_id), "discos.parquet")
+    if not os.path.exists(old_path):
+        return
+    try:
+        df = pd.read_parquet(old_path, engine='pyarrow')
+    except Exception:
+        df = None
+    if df is not None and not os.path.exists(_section_path(user_id, "discos")):
+        _save_table(user_id, "discos", df)
+    os.replace(old_path, old_path + ".migrated")
+
+
+def _file_version(path: str) -> tuple:
+    """Versión de un archivo (mtime + tamaño), (0, 0) si no existe"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return (0, 0)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _section_version(user_id: str, key: str) -> tuple:
+    """
+    Versión del archivo de una sección (mtime + tamaño)
+    
+    Cambia cada vez que save_section reescribe el archivo, así que sirve
+    como clave para las lecturas cacheadas con st.cache_data.
+    """
+    _migrate_legacy_file(user_id)
+    _migrate_discos_table(user_id)
+    # En las tablas particionadas es el directorio el que cambia al reescribir una partición
+    return _file_version(_section_path(user_id, key))
+
+
+# Caché del proceso: ruta -> (versión del archivo, contenido ya parseado).
+# Una lectura solo vuelve a parsear el archivo si su versión ha cambiado.
+_CACHE: Dict[str, tuple] = {}
+
+
+def load_section(user_id: str, key: str):
+    """Carga una sección de los datos del usuario (o su valor por defecto)"""
+    _migrate_legacy_file(user_id)
+    path = _section_path(user_id, key)
+    version = _file_version(path)
+    hit = _CACHE.get(path)
+    if hit is not None and hit[0] == version:
+        # Copia: add_discos y save_* modifican lo que leen antes de guardarlo
+        return copy.deepcopy(hit[1])
+    if version != (0, 0):
         try:
-            with open(data_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
+            value = _read_json(path)
+            _CACHE[path] = (version, value)
+            return copy.deepcopy(value)
         except:
-            return get_default_data()
-    return get_default_data()
+            pass
+    return get_default_data()[key]
+
+
+def save_section(user_id: str, key: str, value):
+    """Guarda una sección de los datos del usuario de forma atómica"""
+    _migrate_legacy_file(user_id)
+    path = _section_path(user_id, key)
+    _write_json_atomic(path, value)
+    # Actualizar la caché con lo que se acaba de escribir (sin volver a leerlo)
+    _CACHE[path] = (_file_version(path), copy.deepcopy(value))
+
+
+def _save_parquet(path: str, df: Optional[pd.DataFrame]):
+    """Guarda un DataFrame en un archivo Parquet; None o vacío elimina el archivo"""
+    _CACHE.pop(path, None)
+    if df is None or df.empty:
+        if os.path.exists(path):
+            os.remove(path)
+        return
+    if 'estilos' in df.columns:
+        # Parquet necesita un tipo único por columna: estilos siempre como lista
+        df = df.assign(estilos=df['estilos'].map(_as_list))
+    _write_table_atomic(path, df)
+    _CACHE[path] = (_file_version(path), df.copy())
+
+
+def _load_parquet(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Carga un archivo Parquet como DataFrame (vacío si no existe)
+    
+    Con `columns` solo se leen del disco esas columnas (y no se cachea el resultado)
+    """
+    version = _file_version(path)
+    if version == (0, 0):
+        return pd.DataFrame()
+    hit = _CACHE.get(path)
+    if hit is not None and hit[0] == version:
+        df = hit[1]
+        if columns is not None:
+            return df[[c for c in columns if c in df.columns]].copy()
+        return df.copy()
+    try:
+        if columns is not None:
+            import pyarrow.parquet as pq
+            disponibles = pq.read_schema(path).names
+            columns = [c for c in columns if c in disponibles]
+        df = pd.read_parquet(path, engine='pyarrow', columns=columns)
+    except Exception:
+        return pd.DataFrame()
+    if 'estilos' in df.columns:
+        # Parquet devuelve las listas como arrays de numpy
+        df['estilos'] = df['estilos'].map(_as_list)
+    if columns is not None:
+        return df
+    _CACHE[path] = (version, df)
+    return df.copy()
+
+
+def _save_table(user_id: str, key: str, df: Optional[pd.DataFrame]):
+    """Guarda una sección tabular (sin migrar); None o vacío elimina el archivo"""
+    path = _section_path(user_id, key)
+    column = _PARTITION_BY.get(key)
+    if column is None:
+        _save_parquet(path, df)
+        return
+    
+    # Tabla particionada: un archivo por valor de la columna, sin restos de particiones viejas
+    os.makedirs(path, exist_ok=True)
+    partes = {}
+    if df is not None and not df.empty:
+        for part_key, part_df in df.groupby(df[column].astype(str), sort=False, observed=True):
+            partes[_partition_path(path, part_key)] = part_df
+    for name in os.listdir(path):
+        part_path = os.path.join(path, name)
+        if part_path not in partes:
+            _save_parquet(part_path, None)
+    for part_path, part_df in partes.items():
+        _save_parquet(part_path, part_df.reset_index(drop=True))
+
+
+def save_partition(user_id: str, key: str, part_key: str, df: Optional[pd.DataFrame]):
+    """
+    Reemplaza una sola partición de una tabla particionada
+    
+    Args:
+        user_id: ID del usuario
+        key: Nombre de la tabla (p. ej. "discos")
+        part_key: Valor de la columna de partición (p. ej. la clave de estilos)
+        df: Filas de la partición; None o vacío la elimina
+    """
+    _migrate_legacy_file(user_id)
+    _migrate_discos_table(user_id)
+    path = _section_path(user_id, key)
+    os.makedirs(path, exist_ok=True)
+    _save_parquet(_partition_path(path, part_key), df)
+
+
+def load_table(user_id: str, key: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Carga una sección tabular (discos, rekordbox) como DataFrame (vacío si no existe)
+    
+    Args:
+        user_id: ID del usuario
+        key: Nombre de la tabla
+        columns: Columnas a leer (None = todas); las que no existan se ignoran
+    """
+    _migrate_legacy_file(user_id)
+    _migrate_discos_table(user_id)
+    path = _section_path(user_id, key)
+    column = _PARTITION_BY.get(key)
+    if column is None:
+        return _load_parquet(path, columns)
+    
+    if not os.path.isdir(path):
+        return pd.DataFrame()
+    # Particiones en orden de escritura (las búsquedas más recientes al final)
+    part_paths = [os.path.join(path, name) for name in os.listdir(path) if name.endswith(".parquet")]
+    part_paths.sort(key=os.path.getmtime)
+    partes = [df for df in (_load_parquet(p, columns) for p in part_paths) if not df.empty]
+    if not partes:
+        return pd.DataFrame()
+    df = pd.concat(partes, ignore_index=True) if len(partes) > 1 else partes[0]
+    if column in df.columns:
+        # Pocas claves distintas repetidas en miles de filas
+        df[column] = df[column].astype(str).astype("category")
+    return df
+
+
+def save_table(user_id: str, key: str, df: Optional[pd.DataFrame]):
+    """Guarda una sección tabular de forma atómica (None o vacío la elimina)"""
+    _migrate_legacy_file(user_id)
+    _migrate_discos_table(user_id)
+    _save_table(user_id, key, df)
+
+
+def load_data(user_id: str) -> Dict:
+    """Carga todos los datos guardados del usuario"""
+    data = {key: load_section(user_id, key) for key in _SECTIONS}
+    for key in _TABLES:
+        df = load_table(user_id, key)
+        data[key] = df.to_dict('records') if not df.empty else get_default_data()[key]
+    return data
 
 
 def save_data(data: Dict, user_id: str):
-    """Guarda los datos del usuario"""
-    data_file = get_user_data_file(user_id)
-    with open(data_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    """Guarda los datos del usuario (una escritura por sección presente en `data`)"""
+    for key in _SECTIONS:
+        if key in data:
+            save_section(user_id, key, data[key])
+    for key in _TABLES:
+        if key in data:
+            save_table(user_id, key, pd.DataFrame(data[key]) if data[key] else None)
 
 
 def get_default_data() -> Dict:
@@ -53,8 +387,8 @@ def get_default_data() -> Dict:
         "estilos": {},
         "ultima_actualizacion": None,
         "rekordbox": None,
-        "tiempos_busqueda": [],
-        "spotify_credentials": None  # Guardar credenciales de Spotify de forma segura
+        "rekordbox_fecha": None,
+        "tiempos_busqueda": []
     }
 
 
@@ -67,54 +401,90 @@ def add_discos(estilos: List[str], discos: List[Dict], user_id: str):
         discos: Lista de discos encontrados
         user_id: ID del usuario
     """
-    data = load_data(user_id)
+    estilos_info = load_section(user_id, "estilos")
     
     # Crear clave única para los estilos (ordenada)
     estilo_key = "|".join(sorted(estilos))
+    # Todos los discos de una búsqueda comparten la misma fecha
+    now_iso = datetime.now().isoformat()
     
     # Actualizar información del estilo
-    data["estilos"][estilo_key] = {
+    estilos_info[estilo_key] = {
         "estilos": estilos,
-        "fecha_busqueda": datetime.now().isoformat(),
+        "fecha_busqueda": now_iso,
         "total_discos": len(discos)
     }
     
-    # Eliminar discos antiguos de estos estilos
-    data["discos"] = [
-        d for d in data["discos"] 
-        if d.get("estilos_key") != estilo_key
-    ]
-    
     # Añadir nuevos discos con metadata
     for disco in discos:
         disco["estilos_key"] = estilo_key
         disco["estilos"] = estilos
-        disco["fecha_busqueda"] = datetime.now().isoformat()
-        data["discos"].append(disco)
+        # Textos normalizados para el buscador de coincidencias
+        disco["artista_norm"] = normalize_text(disco.get("artista", ""))
+        disco["titulo_norm"] = normalize_text(disco.get("titulo", ""))
+        # Precio numérico para las métricas (se parsea una sola vez)
+        disco["precio_num"] = parse_price(disco.get("precio"))
+        disco["fecha_busqueda"] = now_iso
     
-    data["ultima_actualizacion"] = datetime.now().isoformat()
-    save_data(data, user_id)
+    # Reemplazar solo la partición de estos estilos (los discos antiguos se descartan)
+    save_partition(user_id, "discos", estilo_key, pd.DataFrame(discos))
+    save_section(user_id, "estilos", estilos_info)
+    save_section(user_id, "ultima_actualizacion", now_iso)
 
 
 def get_all_discos(user_id: str) -> pd.DataFrame:
     """Obtiene todos los discos guardados como DataFrame"""
-    data = load_data(user_id)
-    if not data["discos"]:
-        return pd.DataFrame()
+    return _get_all_discos_cached(user_id, _section_version(user_id, "discos"))
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _get_all_discos_cached(user_id: str, version: tuple) -> pd.DataFrame:
+    df = load_table(user_id, "discos")
+    if df.empty:
+        return df
     
-    return pd.DataFrame(data["discos"])
+    # Texto de búsqueda precalculado (artista + título en minúsculas) para el filtro de texto
+    df["search_blob"] = (
+        df["artista"].fillna("").astype(str) + "\x1f" + df["titulo"].fillna("").astype(str)
+    ).str.lower()
+    return df
 
 
 def get_estilos_info(user_id: str) -> Dict:
     """Obtiene información de los estilos guardados"""
-    data = load_data(user_id)
-    return data.get("estilos", {})
+    return _get_estilos_info_cached(user_id, _section_version(user_id, "estilos"))
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _get_estilos_info_cached(user_id: str, version: tuple) -> Dict:
+    return load_section(user_id, "estilos")
+
+
+def get_estilos_universe(user_id: str) -> List[str]:
+    """Obtiene la lista ordenada de estilos distintos presentes en los discos guardados"""
+    return _get_estilos_universe_cached(user_id, _section_version(user_id, "discos"))
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _get_estilos_universe_cached(user_id: str, version: tuple) -> List[str]:
+    # Solo hace falta la columna de estilos, no la tabla entera
+    discos_df = load_table(user_id, "discos", columns=["estilos"])
+    if 'estilos' not in discos_df.columns:
+        return []
+    estilos_unicos = set()
+    for estilos in discos_df['estilos']:
+        estilos_unicos.update(estilos)
+    return sorted(estilos_unicos)
 
 
 def get_ultima_actualizacion(user_id: str) -> Optional[str]:
     """Obtiene la fecha de última actualización"""
-    data = load_data(user_id)
-    return data.get("ultima_actualizacion")
+    return _get_ultima_actualizacion_cached(user_id, _section_version(user_id, "ultima_actualizacion"))
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _get_ultima_actualizacion_cached(user_id: str, version: tuple) -> Optional[str]:
+    return load_section(user_id, "ultima_actualizacion")
 
 
 def save_rekordbox(rekordbox_df: pd.DataFrame, user_id: str):
@@ -125,17 +495,14 @@ def save_rekordbox(rekordbox_df: pd.DataFrame, user_id: str):
         rekordbox_df: DataFrame de Rekordbox
         user_id: ID del usuario
     """
-    data = load_data(user_id)
-    
-    # Convertir DataFrame a lista de diccionarios
+    # Guardar el DataFrame tal cual (Parquet)
     if not rekordbox_df.empty:
-        data["rekordbox"] = rekordbox_df.to_dict('records')
-        data["rekordbox_fecha"] = datetime.now().isoformat()
+        if 'artista_norm' not in rekordbox_df.columns or 'titulo_norm' not in rekordbox_df.columns:
+            rekordbox_df = add_normalized_columns(rekordbox_df)
+        save_table(user_id, "rekordbox", rekordbox_df)
+        save_section(user_id, "rekordbox_fecha", datetime.now().isoformat())
     else:
-        data["rekordbox"] = None
-        data["rekordbox_fecha"] = None
-    
-    save_data(data, user_id)
+        clear_rekordbox(user_id)
 
 
 def get_rekordbox(user_id: str) -> pd.DataFrame:
@@ -145,26 +512,28 @@ def get_rekordbox(user_id: str) -> pd.DataFrame:
     Returns:
         DataFrame de Rekordbox o DataFrame vacío
     """
-    data = load_data(user_id)
-    
-    if data.get("rekordbox") is not None:
-        return pd.DataFrame(data["rekordbox"])
-    
-    return pd.DataFrame()
+    return _get_rekordbox_cached(user_id, _section_version(user_id, "rekordbox"))
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _get_rekordbox_cached(user_id: str, version: tuple) -> pd.DataFrame:
+    return load_table(user_id, "rekordbox")
 
 
 def get_rekordbox_fecha(user_id: str) -> Optional[str]:
     """Obtiene la fecha de carga de Rekordbox"""
-    data = load_data(user_id)
-    return data.get("rekordbox_fecha")
+    return _get_rekordbox_fecha_cached(user_id, _section_version(user_id, "rekordbox_fecha"))
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _get_rekordbox_fecha_cached(user_id: str, version: tuple) -> Optional[str]:
+    return load_section(user_id, "rekordbox_fecha")
 
 
 def clear_rekordbox(user_id: str):
     """Elimina los datos de Rekordbox guardados"""
-    data = load_data(user_id)
-    data["rekordbox"] = None
-    data["rekordbox_fecha"] = None
-    save_data(data, user_id)
+    save_table(user_id, "rekordbox", None)
+    save_section(user_id, "rekordbox_fecha", None)
 
 
 def save_tiempo_busqueda(tiempo_segundos: float, total_items: int, user_id: str):
@@ -176,22 +545,19 @@ def save_tiempo_busqueda(tiempo_segundos: float, total_items: int, user_id: str)
         total_items: Total de items comparados
         user_id: ID del usuario
     """
-    data = load_data(user_id)
-    
-    if "tiempos_busqueda" not in data:
-        data["tiempos_busqueda"] = []
+    tiempos = load_section(user_id, "tiempos_busqueda")
     
-    data["tiempos_busqueda"].append({
+    tiempos.append({
         "tiempo": tiempo_segundos,
         "items": total_items,
         "fecha": datetime.now().isoformat()
     })
     
     # Mantener solo los últimos 50 registros
-    if len(data["tiempos_busqueda"]) > 50:
-        data["tiempos_busqueda"] = data["tiempos_busqueda"][-50:]
+    if len(tiempos) > 50:
+        tiempos = tiempos[-50:]
     
-    save_data(data, user_id)
+    save_section(user_id, "tiempos_busqueda", tiempos)
 
 
 def get_tiempo_estimado(total_items: int, user_id: str) -> float:
@@ -205,46 +571,36 @@ def get_tiempo_estimado(total_items: int, user_id: str) -> float:
     Returns:
         Tiempo estimado en segundos
     """
-    data = load_data(user_id)
-    tiempos = data.get("tiempos_busqueda", [])
+    tiempos = load_section(user_id, "tiempos_busqueda")
     
     if not tiempos:
         return None
     
     # Calcular tiempo por item de cada búsqueda
-    tiempos_por_item = []
-    for registro in tiempos:
-        if registro["items"] > 0:
-            tiempo_por_item = registro["tiempo"] / registro["items"]
-            tiempos_por_item.append(tiempo_por_item)
-    
-    if not tiempos_por_item:
-        return None
+    tiempos_por_item = np.fromiter(
+        (r["tiempo"] / r["items"] for r in tiempos if r["items"] > 0),
+        dtype=np.float64
+    )
     
     # Eliminar outliers (valores fuera de Q1-1.5*IQR y Q3+1.5*IQR)
-    import numpy as np
-    if len(tiempos_por_item) > 3:
-        q1 = np.percentile(tiempos_por_item, 25)
-        q3 = np.percentile(tiempos_por_item, 75)
+    if tiempos_por_item.size > 3:
+        q1, q3 = np.percentile(tiempos_por_item, [25, 75])
         iqr = q3 - q1
-        lower_bound = q1 - 1.5 * iqr
-        upper_bound = q3 + 1.5 * iqr
-        
-        tiempos_por_item = [t for t in tiempos_por_item if lower_bound <= t <= upper_bound]
+        mask = (tiempos_por_item >= q1 - 1.5 * iqr) & (tiempos_por_item <= q3 + 1.5 * iqr)
+        tiempos_por_item = tiempos_por_item[mask]
     
-    if not tiempos_por_item:
+    if not tiempos_por_item.size:
         return None
     
-    # Calcular media
-    tiempo_promedio = sum(tiempos_por_item) / len(tiempos_por_item)
-    
-    # Estimar tiempo total
-    return tiempo_promedio * total_items
+    # Estimar tiempo total a partir de la media
+    return float(tiempos_por_item.mean()) * total_items
 
 
 def clear_data(user_id: str):
     """Limpia todos los datos guardados del usuario"""
     save_data(get_default_data(), user_id)
+    # Las credenciales de Spotify viven en su propio archivo: borrarlas también
+    clear_spotify_credentials(user_id)
 
 
 def save_spotify_credentials(client_id: str, client_secret: str, redirect_uri: str, user_id: str):
@@ -257,14 +613,19 @@ def save_spotify_credentials(client_id: str, client_secret: str, redirect_uri: s
         redirect_uri: Redirect URI configurado
         user_id: ID del usuario
     """
-    data = load_data(user_id)
-    data["spotify_credentials"] = {
+    _migrate_legacy_file(user_id)
+    path = _creds_path(user_id)
+    _write_json_atomic(path, {
         "client_id": client_id,
         "client_secret": client_secret,
         "redirect_uri": redirect_uri,
         "saved_at": datetime.now().isoformat()
-    }
-    save_data(data, user_id)
+    })
+    try:
+        # Solo legible por el propietario
+        os.chmod(path, 0o600)
+    except OSError:
+        pass
 
 
 def get_spotify_credentials(user_id: str) -> Optional[Dict]:
@@ -277,13 +638,21 @@ def get_spotify_credentials(user_id: str) -> Optional[Dict]:
     Returns:
         Diccionario con credenciales o None si no existen
     """
-    data = load_data(user_id)
-    return data.get("spotify_credentials")
+    _migrate_legacy_file(user_id)
+    _migrate_creds_file(user_id)
+    path = _creds_path(user_id)
+    if not os.path.exists(path):
+        return None
+    try:
+        return _read_json(path)
+    except (OSError, ValueError):
+        return None
 
 
 def clear_spotify_credentials(user_id: str):
     """Elimina las credenciales guardadas de Spotify"""
-    data = load_data(user_id)
-    data["spotify_credentials"] = None
-    save_data(data, user_id)
+    _migrate_creds_file(user_id)
+    path = _creds_path(user_id)
+    if os.path.exists(path):
+        os.remove(path)
 
@@ -6,13 +6,23 @@ Permite seleccionar carpetas y extraer metadatos de archivos de audio
 import streamlit as st
 import pandas as pd
 import os
-from pathlib import Path
-from typing import List, Dict
+from typing import Dict, Iterable, Iterator, List
+import functools
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+
+from data_storage import PARQUET_COMPRESSION, PARQUET_COMPRESSION_LEVEL, get_user_data_dir
+from utils import df_to_csv_bytes
 
 try:
     from mutagen import File
     from mutagen.id3 import ID3NoHeaderError
+    from mutagen.mp3 import EasyMP3
+    from mutagen.easymp4 import EasyMP4
+    from mutagen.flac import FLAC
+    from mutagen.oggvorbis import OggVorbis
+    from mutagen.oggopus import OggOpus
     MUTAGEN_AVAILABLE = True
 except ImportError:
     MUTAGEN_AVAILABLE = False
@@ -25,84 +35,168 @@ AUDIO_EXTENSIONS = {
     '.au', '.ra', '.rm', '.tta', '.vox', '.webm'
 }
 
+# Las mismas extensiones como tupla para str.endswith (comprobación en C)
+_EXT_TUPLE = tuple(AUDIO_EXTENSIONS)
+
+# Hilos para leer metadatos (la lectura está limitada por el disco, no por la CPU)
+METADATA_WORKERS = min(32, (os.cpu_count() or 4) * 4)
+
+# Número aproximado de refrescos de la barra de progreso por escaneo
+PROGRESS_UPDATES = 200
 
-def scan_directory(directory: str) -> List[Dict]:
+# Caché de metadatos en disco, una por usuario: ruta -> (mtime_ns, tamaño, metadatos).
+# Un archivo solo se vuelve a leer con mutagen si ha cambiado desde el último escaneo
+METADATA_CACHE_FILE = "local_music_cache.parquet"
+_MD_CACHES: Dict[str, Dict[str, tuple]] = {}
+# Varias sesiones del mismo usuario comparten su caché: carga, poda y guardado van con este lock.
+# Los hilos de lectura solo insertan entradas, así que los recorridos usan una copia (list(...))
+_MD_CACHE_LOCK = threading.Lock()
+
+
+def iter_audio_files(directory: str) -> Iterator[str]:
     """
-    Escanea un directorio recursivamente buscando archivos de audio
+    Recorre un directorio recursivamente y devuelve las rutas de audio según las encuentra
     
     Args:
         directory: Ruta del directorio a escanear
     
-    Returns:
-        Lista de diccionarios con información de archivos de audio
+    Yields:
+        Ruta de cada archivo de audio
     """
-    audio_files = []
-    directory_path = Path(directory)
+    if not os.path.isdir(directory):
+        return
     
-    if not directory_path.exists():
-        return []
+    # Recorrido en profundidad con os.scandir: el tipo de cada entrada viene
+    # del propio listado del directorio, sin objetos Path ni stat por archivo
+    pendientes = [directory]
+    while pendientes:
+        actual = pendientes.pop()
+        try:
+            entradas = os.scandir(actual)
+        except OSError:
+            continue
+        with entradas:
+            for entrada in entradas:
+                if entrada.is_dir(follow_symlinks=False):
+                    pendientes.append(entrada.path)
+                elif entrada.is_file(follow_symlinks=False):
+                    if entrada.name.lower().endswith(_EXT_TUPLE):
+                        yield entrada.path
+
+
+def scan_directory(directory: str) -> List[str]:
+    """
+    Escanea un directorio recursivamente buscando archivos de audio
     
-    # Recorrer recursivamente
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            file_path = Path(root) / file
-            if file_path.suffix.lower() in AUDIO_EXTENSIONS:
-                audio_files.append(str(file_path))
+    Args:
+        directory: Ruta del directorio a escanear
     
-    return audio_files
+    Returns:
+        Lista de rutas de archivos de audio
+    """
+    return list(iter_audio_files(directory))
 
 
-def extract_metadata(file_path: str) -> Dict:
+def _collect(iterable: Iterable[str], destino: List[str]) -> Iterator[str]:
+    """Pasa los elementos de `iterable` tal cual, guardando una copia en `destino`"""
+    for item in iterable:
+        destino.append(item)
+        yield item
+
+
+# Parser de mutagen por extensión: evita que mutagen.File pruebe todos los formatos.
+# Las variantes "Easy" exponen las etiquetas con claves simples (artist, title, album)
+_PARSERS = {
+    '.mp3': EasyMP3,
+    '.m4a': EasyMP4,
+    '.mp4': EasyMP4,
+    '.m4p': EasyMP4,
+    '.flac': FLAC,
+    '.ogg': OggVorbis,
+    '.oga': OggVorbis,
+    '.opus': OggOpus,
+} if MUTAGEN_AVAILABLE else {}
+
+# Claves de cada campo: primero la forma simple, luego ID3 y APEv2 (WAV, AIFF, APE...)
+_TAG_KEYS = {
+    'artista': ('artist', 'TPE1', 'ARTIST'),
+    'titulo': ('title', 'TIT2', 'TITLE'),
+    'album': ('album', 'TALB', 'ALBUM'),
+}
+
+
+def _open_audio(file_path: str, extension: str):
+    """Abre un archivo con el parser de su extensión (o con la detección de mutagen)"""
+    parser = _PARSERS.get(extension)
+    if parser is not None:
+        try:
+            return parser(file_path)
+        except Exception:
+            # Extensión que no corresponde al contenido: dejar que mutagen lo detecte
+            pass
+    return File(file_path, easy=True)
+
+
+def filename_metadata(file_path: str) -> Dict:
     """
-    Extrae metadatos de un archivo de audio
+    Metadatos deducidos solo del nombre del archivo (sin abrirlo)
     
     Args:
         file_path: Ruta del archivo de audio
     
     Returns:
-        Diccionario con metadatos extraídos
+        Diccionario con los mismos campos que extract_metadata
     """
+    # Nombre y extensión calculados una sola vez
+    nombre = os.path.basename(file_path)
+    base, _, extension = nombre.rpartition('.')
+    if not base:
+        # Sin punto (o solo un punto inicial): no hay extensión
+        base, extension = nombre, ''
+    
     metadata = {
-        'archivo': os.path.basename(file_path),
+        'archivo': nombre,
         'ruta': file_path,
         'artista': 'Desconocido',
-        'titulo': os.path.splitext(os.path.basename(file_path))[0],
+        'titulo': base,
         'album': 'Desconocido',
         'duracion': 'N/A',
-        'formato': os.path.splitext(file_path)[1].upper()
+        'formato': ('.' + extension).upper() if extension else ''
     }
+    return metadata
+
+
+def extract_metadata(file_path: str) -> Dict:
+    """
+    Extrae metadatos de un archivo de audio
+    
+    Args:
+        file_path: Ruta del archivo de audio
+    
+    Returns:
+        Diccionario con metadatos extraídos
+    """
+    metadata = filename_metadata(file_path)
     
     if not MUTAGEN_AVAILABLE:
         return metadata
     
     try:
-        audio_file = File(file_path)
+        audio_file = _open_audio(file_path, metadata['formato'].lower())
         
         if audio_file is not None:
-            # Extraer artista
-            if 'TPE1' in audio_file or 'ARTIST' in audio_file:
-                artist = audio_file.get('TPE1', audio_file.get('ARTIST', ['Desconocido']))[0]
-                if artist:
-                    metadata['artista'] = str(artist)
-            
-            # Extraer título
-            if 'TIT2' in audio_file or 'TITLE' in audio_file:
-                title = audio_file.get('TIT2', audio_file.get('TITLE', [metadata['titulo']]))[0]
-                if title:
-                    metadata['titulo'] = str(title)
-            
-            # Extraer álbum
-            if 'TALB' in audio_file or 'ALBUM' in audio_file:
-                album = audio_file.get('TALB', audio_file.get('ALBUM', ['Desconocido']))[0]
-                if album:
-                    metadata['album'] = str(album)
+            # Extraer artista, título y álbum (la primera clave presente)
+            for campo, claves in _TAG_KEYS.items():
+                for clave in claves:
+                    if clave in audio_file:
+                        valor = audio_file[clave][0]
+                        if valor:
+                            metadata[campo] = str(valor)
+                        break
             
             # Extraer duración
             if hasattr(audio_file, 'info') and hasattr(audio_file.info, 'length'):
-                duration_sec = int(audio_file.info.length)
-                minutes = duration_sec // 60
-                seconds = duration_sec % 60
-                metadata['duracion'] = f"{minutes}:{seconds:02d}"
+                metadata['duracion'] = format_duration(audio_file.info.length)
         
     except (ID3NoHeaderError, Exception) as e:
         # Si no se pueden extraer metadatos, usar valores por defecto
@@ -111,14 +205,129 @@ def extract_metadata(file_path: str) -> Dict:
     return metadata
 
 
+def _metadata_cache_path(user_id: str) -> str:
+    """Obtiene la ruta de la caché de metadatos del usuario"""
+    return os.path.join(get_user_data_dir(user_id), METADATA_CACHE_FILE)
+
+
+def load_metadata_cache(user_id: str) -> Dict[str, tuple]:
+    """Carga la caché de metadatos del usuario desde disco (solo la primera vez)"""
+    with _MD_CACHE_LOCK:
+        if user_id in _MD_CACHES:
+            return _MD_CACHES[user_id]
+        cache = {}
+        path = _metadata_cache_path(user_id)
+        try:
+            df = pd.read_parquet(path, engine='pyarrow') if os.path.exists(path) else pd.DataFrame()
+        except Exception:
+            df = pd.DataFrame()
+        for record in df.to_dict('records'):
+            mtime_ns = int(record.pop('mtime_ns'))
+            size = int(record.pop('size'))
+            cache[record['ruta']] = (mtime_ns, size, record)
+        _MD_CACHES[user_id] = cache
+        return cache
+
+
+def save_metadata_cache(user_id: str, folder_path: str, seen_paths: Iterable[str]):
+    """
+    Guarda la caché de metadatos del usuario en disco de forma atómica
+    
+    Args:
+        user_id: ID del usuario
+        folder_path: Carpeta escaneada
+        seen_paths: Rutas del último escaneo de folder_path; las demás entradas de esa carpeta
+            (archivos borrados o movidos) se descartan. Las de otras carpetas se conservan
+    """
+    cache = load_metadata_cache(user_id)
+    prefijo = os.path.join(folder_path, '')
+    seen = set(seen_paths)
+    with _MD_CACHE_LOCK:
+        for ruta in [ruta for ruta in list(cache) if ruta.startswith(prefijo) and ruta not in seen]:
+            cache.pop(ruta, None)
+        entradas = list(cache.values())
+        if not entradas:
+            return
+        df = pd.DataFrame([
+            {**metadata, 'mtime_ns': mtime_ns, 'size': size}
+            for mtime_ns, size, metadata in entradas
+        ])
+        path = _metadata_cache_path(user_id)
+        tmp = path + ".tmp"
+        try:
+            df.to_parquet(
+                tmp, engine='pyarrow', index=False,
+                compression=PARQUET_COMPRESSION, compression_level=PARQUET_COMPRESSION_LEVEL
+            )
+            os.replace(tmp, path)
+        except Exception:
+            # La caché es opcional: si no se puede guardar, el próximo escaneo relee los archivos
+            pass
+
+
+def get_metadata(file_path: str, cache: Dict[str, tuple]) -> Dict:
+    """
+    Obtiene los metadatos de un archivo, desde la caché si no ha cambiado
+    
+    Args:
+        file_path: Ruta del archivo de audio
+        cache: Caché de metadatos del usuario (load_metadata_cache)
+    
+    Returns:
+        Diccionario con metadatos extraídos
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return extract_metadata(file_path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = cache.get(file_path)
+    if cached is not None and cached[:2] == key:
+        return dict(cached[2])
+    metadata = extract_metadata(file_path)
+    cache[file_path] = (*key, dict(metadata))
+    return metadata
+
+
 def format_duration(seconds: float) -> str:
     """Formatea duración en segundos a mm:ss"""
-    minutes = int(seconds // 60)
-    secs = int(seconds % 60)
+    minutes, secs = divmod(int(seconds), 60)
     return f"{minutes}:{secs:02d}"
 
 
-def render_local_music_tab():
+def _metadata_columns(resultados: Iterable[Dict], total_files: int) -> Dict[str, List]:
+    """
+    Reúne los metadatos en una lista por columna mostrando una barra de progreso
+    
+    Args:
+        resultados: Metadatos de cada archivo, en orden
+        total_files: Número de archivos (para la barra de progreso)
+    
+    Returns:
+        Diccionario columna -> lista de valores
+    """
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+    
+    columnas = {campo: [] for campo in ('archivo', 'ruta', 'artista', 'titulo', 'album', 'duracion', 'formato')}
+    # Refrescar la interfaz ~PROGRESS_UPDATES veces, no una por archivo
+    step = max(1, total_files // PROGRESS_UPDATES)
+    
+    for i, metadata in enumerate(resultados):
+        for campo, valores in columnas.items():
+            valores.append(metadata[campo])
+        
+        # Actualizar progreso
+        if (i + 1) % step == 0 or i + 1 == total_files:
+            progress_bar.progress((i + 1) / total_files)
+            status_text.text(f"Procesando {i + 1}/{total_files}")
+    
+    progress_bar.empty()
+    status_text.empty()
+    return columnas
+
+
+def render_local_music_tab(user_id: str):
     """Renderiza la pestaña de música local"""
     
     st.info("💡 Selecciona una carpeta para escanear archivos de audio")
@@ -130,38 +339,52 @@ def render_local_music_tab():
         help="Introduce la ruta completa de la carpeta que contiene tu música"
     )
     
+    fast_scan = st.checkbox(
+        "⚡ Escaneo rápido (sin metadatos)",
+        help="Solo usa el nombre de cada archivo: no lee etiquetas ni duración"
+    )
+    
     if folder_path:
         if st.button("🔍 Escanear Carpeta", type="primary"):
             if os.path.exists(folder_path) and os.path.isdir(folder_path):
                 with st.spinner("🔍 Escaneando carpeta... Esto puede tardar un poco..."):
                     # Escanear archivos
-                    audio_files = scan_directory(folder_path)
+                    audio_files = []
+                    columnas = None
+                    if fast_scan:
+                        # Sin abrir los archivos: solo el nombre
+                        audio_files = scan_directory(folder_path)
+                        if audio_files:
+                            st.success(f"✅ Encontrados {len(audio_files)} archivos de audio")
+                            columnas = _metadata_columns(map(filename_metadata, audio_files), len(audio_files))
+                    else:
+                        cache = load_metadata_cache(user_id)
+                        with ThreadPoolExecutor(max_workers=METADATA_WORKERS) as executor:
+                            # Cada archivo se envía a los hilos en cuanto aparece en el recorrido:
+                            # la lectura de etiquetas empieza mientras se siguen listando carpetas.
+                            # Executor.map envía todas las tareas antes de volver, así que aquí el
+                            # listado ya ha terminado y audio_files está completo
+                            resultados = executor.map(
+                                functools.partial(get_metadata, cache=cache),
+                                _collect(iter_audio_files(folder_path), audio_files)
+                            )
+                            if audio_files:
+                                st.success(f"✅ Encontrados {len(audio_files)} archivos de audio")
+                                columnas = _metadata_columns(resultados, len(audio_files))
+                        if audio_files:
+                            save_metadata_cache(user_id, folder_path, audio_files)
                     
-                    if audio_files:
-                        st.success(f"✅ Encontrados {len(audio_files)} archivos de audio")
-                        
-                        # Barra de progreso
-                        progress_bar = st.progress(0)
-                        status_text = st.empty()
-                        
-                        # Extraer metadatos
-                        all_metadata = []
-                        total_files = len(audio_files)
-                        
-                        for i, file_path in enumerate(audio_files):
-                            metadata = extract_metadata(file_path)
-                            all_metadata.append(metadata)
-                            
-                            # Actualizar progreso
-                            progress = (i + 1) / total_files
-                            progress_bar.progress(progress)
-                            status_text.text(f"Procesando {i + 1}/{total_files}: {os.path.basename(file_path)}")
-                        
-                        progress_bar.empty()
-                        status_text.empty()
-                        
-                        # Crear DataFrame
-                        df = pd.DataFrame(all_metadata)
+                    if columnas is not None:
+                        # Crear DataFrame directamente por columnas
+                        df = pd.DataFrame({
+                            'archivo': columnas['archivo'],
+                            'ruta': columnas['ruta'],
+                            'artista': pd.array(columnas['artista'], dtype='string'),
+                            'titulo': pd.array(columnas['titulo'], dtype='string'),
+                            'album': pd.array(columnas['album'], dtype='string'),
+                            'duracion': columnas['duracion'],
+                            'formato': pd.Categorical(columnas['formato']),
+                        })
                         
                         # Mostrar resultados
                         st.subheader("📀 Archivos de Audio Encontrados")
@@ -182,7 +405,7 @@ def render_local_music_tab():
                         st.markdown("---")
                         col1, col2, col3, col4 = st.columns(4)
                         with col1:
-                            st.metric("Total Archivos", len(all_metadata))
+                            st.metric("Total Archivos", len(df))
                         with col2:
                             st.metric("Artistas Únicos", df['artista'].nunique())
                         with col3:
@@ -197,7 +420,7 @@ def render_local_music_tab():
                             st.bar_chart(formats)
                         
                         # Botón de descarga
-                        csv = df.to_csv(index=False).encode('utf-8-sig')
+                        csv = df_to_csv_bytes(df)
                         st.download_button(
                             label="📥 Descargar CSV",
                             data=csv,
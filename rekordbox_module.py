@@ -5,12 +5,72 @@ y comparar con discos scrapeados
 
 import streamlit as st
 import pandas as pd
+import csv
+import hashlib
 import io
 import time
-import re
 from datetime import datetime
 from typing import List, Dict, Tuple
-from difflib import SequenceMatcher
+
+import numpy as np
+from rapidfuzz import process, fuzz
+
+try:
+    from charset_normalizer import from_bytes
+    CHARSET_NORMALIZER_AVAILABLE = True
+except ImportError:
+    CHARSET_NORMALIZER_AVAILABLE = False
+
+from utils import normalize_text, normalize_series, add_normalized_columns, parse_prices
+
+
+# Marcas de orden de bytes (BOM) y su codificación
+_BOMS = (
+    (b'\xef\xbb\xbf', 'utf-8-sig'),
+    (b'\xff\xfe', 'utf-16'),
+    (b'\xfe\xff', 'utf-16'),
+)
+
+
+def decode_rekordbox_bytes(file_bytes: bytes) -> str:
+    """
+    Decodifica el archivo TXT de Rekordbox detectando su codificación
+    
+    Primero por BOM (Rekordbox exporta en UTF-16 con BOM), luego UTF-8 y,
+    si no, detección con charset_normalizer en una sola pasada.
+    
+    Args:
+        file_bytes: Contenido del archivo
+    
+    Returns:
+        Contenido como texto
+    """
+    for bom, encoding in _BOMS:
+        if file_bytes.startswith(bom):
+            try:
+                return file_bytes.decode(encoding)
+            except UnicodeDecodeError:
+                break
+    
+    try:
+        return file_bytes.decode('utf-8')
+    except UnicodeDecodeError:
+        pass
+    
+    if CHARSET_NORMALIZER_AVAILABLE:
+        best = from_bytes(file_bytes).best()
+        if best is not None:
+            return str(best)
+    else:
+        # Sin detector: probar codificaciones habituales en orden
+        for encoding in ['utf-16', 'cp1252']:
+            try:
+                return file_bytes.decode(encoding)
+            except UnicodeDecodeError:
+                continue
+    
+    # Si nada funciona, usar errors='replace' para ignorar caracteres problemáticos
+    return file_bytes.decode('utf-8', errors='replace')
 
 
 def parse_rekordbox_txt(file_content: str) -> pd.DataFrame:
@@ -23,26 +83,29 @@ def parse_rekordbox_txt(file_content: str) -> pd.DataFrame:
     Returns:
         DataFrame con las columnas parseadas
     """
-    lines = file_content.strip().split('\n')
+    cabecera, _, cuerpo = file_content.strip().partition('\n')
     
-    if len(lines) < 2:
+    if not cuerpo.strip():
         return pd.DataFrame()
     
     # Primera línea son los headers
-    headers = lines[0].split('\t')
-    
-    # Parsear datos
-    data = []
-    for line in lines[1:]:
-        if line.strip():
-            values = line.split('\t')
-            if len(values) >= len(headers):
-                row = {}
-                for i, header in enumerate(headers):
-                    row[header.strip()] = values[i].strip() if i < len(values) else ''
-                data.append(row)
+    headers = [h.strip() for h in cabecera.split('\t')]
     
-    df = pd.DataFrame(data)
+    # Parsear datos con el lector en C de pandas: todo como texto, sin comillas
+    # ni NaN; las columnas de más se ignoran y las que faltan quedan vacías
+    columnas = range(len(headers))
+    df = pd.read_csv(
+        io.StringIO(cuerpo), sep='\t', header=None, names=columnas, usecols=columnas,
+        dtype=str, engine='c', quoting=csv.QUOTE_NONE,
+        keep_default_na=False, na_filter=False
+    )
+    df.columns = headers
+    # Con headers repetidos se queda la última columna (como al construir cada fila)
+    df = df.loc[:, ~df.columns.duplicated(keep='last')]
+    for col in df.columns:
+        df[col] = df[col].str.strip()
+    # Descartar líneas que solo tenían espacios o tabuladores
+    df = df[(df != '').any(axis=1)].reset_index(drop=True)
     
     # Normalizar nombres de columnas comunes
     if 'Título de la pista' in df.columns:
@@ -69,73 +132,295 @@ def separate_artist_title(df: pd.DataFrame) -> pd.DataFrame:
     """
     df = df.copy()
     
-    # Si artista está vacío pero título tiene contenido, intentar separar
-    for idx, row in df.iterrows():
-        artista = str(row.get('artista', '')).strip()
-        titulo = str(row.get('titulo', '')).strip()
-        
-        # Si artista está vacío y título tiene formato "Artista - Título"
-        if not artista and titulo:
-            # Buscar patrones comunes: "Artista - Título", "Artista / Título", etc.
-            separators = [' - ', ' / ', ' – ', ' — ', ' | ']
-            for sep in separators:
-                if sep in titulo:
-                    parts = titulo.split(sep, 1)
-                    if len(parts) == 2:
-                        df.at[idx, 'artista'] = parts[0].strip()
-                        df.at[idx, 'titulo'] = parts[1].strip()
-                        break
-        
-        # Si ambos tienen contenido pero título contiene el artista
-        elif artista and titulo:
-            # Si el título empieza con el artista, separar
-            if titulo.startswith(artista):
-                # Remover artista del inicio del título
-                titulo_clean = titulo[len(artista):].strip()
-                separators = [' - ', ' / ', ' – ', ' — ', ' | ']
-                for sep in separators:
-                    if titulo_clean.startswith(sep):
-                        df.at[idx, 'titulo'] = titulo_clean[len(sep):].strip()
-                        break
+    artistas = df['artista'].astype(str).str.strip()
+    titulos = df['titulo'].astype(str).str.strip()
+    
+    # Si artista está vacío y título tiene formato "Artista - Título"
+    pendientes = (artistas == '') & (titulos != '')
+    # Buscar patrones comunes: "Artista - Título", "Artista / Título", etc. (en este orden)
+    for sep in [' - ', ' / ', ' – ', ' — ', ' | ']:
+        if not pendientes.any():
+            break
+        con_sep = pendientes & titulos.str.contains(sep, regex=False)
+        if con_sep.any():
+            partes = titulos[con_sep].str.split(sep, n=1, expand=True)
+            df.loc[con_sep, 'artista'] = partes[0].str.strip()
+            df.loc[con_sep, 'titulo'] = partes[1].str.strip()
+            pendientes &= ~con_sep
     
     return df
 
 
-def normalize_text(text: str) -> str:
-    """Normaliza texto para comparación"""
-    if not text:
-        return ""
-    # Convertir a minúsculas, quitar acentos básicos, espacios extra
-    text = text.lower().strip()
-    # Remover caracteres especiales comunes
-    text = re.sub(r'[^\w\s]', '', text)
-    # Normalizar espacios
-    text = re.sub(r'\s+', ' ', text)
-    return text
+def similarity_score(str1: str, str2: str, min_threshold: float = 0.0) -> float:
+    """
+    Calcula similitud entre dos strings (0-1, misma escala que el buscador)
+    
+    Args:
+        str1: Primer texto
+        str2: Segundo texto
+        min_threshold: Similitud mínima de interés; por debajo se devuelve 0
+            (rapidfuzz descarta antes las parejas de longitudes muy distintas)
+    
+    Returns:
+        Similitud entre 0 y 1
+    """
+    norm1 = normalize_text(str1)
+    norm2 = normalize_text(str2)
+    # Textos idénticos: no hace falta puntuar (dos textos vacíos no se parecen)
+    if norm1 == norm2:
+        return 1.0 if norm1 else 0.0
+    return fuzz.ratio(norm1, norm2, score_cutoff=min_threshold * 100) / 100.0
+
+
+def _format_estilos(estilos) -> str:
+    """Convierte la lista de estilos de un disco en texto"""
+    return ', '.join(estilos) if isinstance(estilos, list) else str(estilos if estilos is not None else '')
+
+
+def _normalized_column(df: pd.DataFrame, col: str) -> pd.Series:
+    """Devuelve la columna normalizada precalculada (<col>_norm) o la calcula al vuelo"""
+    norm_col = f'{col}_norm'
+    if norm_col not in df.columns:
+        return normalize_series(df[col])
+    # Las filas sin valor guardado (discos antiguos) se normalizan al vuelo
+    normalizada = df[norm_col].astype(object)
+    faltan = normalizada.isna()
+    if faltan.any():
+        normalizada[faltan] = normalize_series(df.loc[faltan, col])
+    return normalizada.fillna('').astype(str)
+
+
+# Celdas máximas (filas × discos) de cada matriz de similitud por bloque (~16 MB en float32)
+MAX_CELDAS_BLOQUE = 4_000_000
+
+
+def build_disc_index(discos_df: pd.DataFrame) -> Dict[str, list]:
+    """
+    Prepara el catálogo de discos para el buscador de coincidencias
+    
+    El catálogo solo cambia al scrapear, así que este índice puede
+    construirse una vez por versión y reutilizarse en cada búsqueda.
+    
+    Args:
+        discos_df: DataFrame de discos scrapeados
+    
+    Returns:
+        Diccionario con listas paralelas: artistas, titulos, artistas_norm,
+        titulos_norm, precios, precios_num y estilos ya como texto (solo discos con
+        artista o título)
+    """
+    if discos_df.empty or 'artista' not in discos_df.columns or 'titulo' not in discos_df.columns:
+        return {key: [] for key in ('artistas', 'titulos', 'artistas_norm', 'titulos_norm',
+                                    'precios', 'precios_num', 'estilos')}
+    
+    # Descartar los discos que no tienen ni artista ni título
+    artistas = discos_df['artista'].fillna('').astype(str).str.strip()
+    titulos = discos_df['titulo'].fillna('').astype(str).str.strip()
+    validos = ((artistas != '') | (titulos != '')).to_numpy()
+    total = int(validos.sum())
+    
+    # Precio numérico guardado al ingerir; solo se parsean los discos antiguos que no lo tienen
+    precios = discos_df['precio'] if 'precio' in discos_df.columns else pd.Series('N/A', index=discos_df.index)
+    if 'precio_num' in discos_df.columns:
+        precios_num = pd.to_numeric(discos_df['precio_num'], errors='coerce')
+        faltan = precios_num.isna()
+        precios_num[faltan] = parse_prices(precios[faltan])
+    else:
+        precios_num = parse_prices(precios)
+    
+    return {
+        'artistas': artistas[validos].tolist(),
+        'titulos': titulos[validos].tolist(),
+        # Columnas normalizadas guardadas al ingerir los discos si existen
+        'artistas_norm': _normalized_column(discos_df, 'artista')[validos].tolist(),
+        'titulos_norm': _normalized_column(discos_df, 'titulo')[validos].tolist(),
+        'precios': precios[validos].tolist(),
+        'precios_num': precios_num[validos].astype(float).tolist(),
+        # Texto de estilos formateado una vez por disco, no por coincidencia
+        'estilos': ([_format_estilos(e) for e in discos_df['estilos'][validos].tolist()]
+                    if 'estilos' in discos_df.columns else [''] * total),
+    }
+
+
+# Umbrales fijos de la coincidencia "Título fuerte" (escala 0-100)
+UMBRAL_TITULO_FUERTE = np.float32(90)
+UMBRAL_ARTISTA_FUERTE = np.float32(50)
+
+# Columnas de las parejas candidatas guardadas en `scores`
+_COLUMNAS_PARES = ('fila', 'disco', 'solo_titulo', 'sim_artista', 'sim_titulo', 'cruz_artista', 'cruz_titulo')
+
+
+# Tipos de coincidencia (los registros guardan su índice en esta tupla)
+TIPOS_MATCH = ('Normal', 'Título', 'Título fuerte', 'Cruzado')
+TIPO_NORMAL, TIPO_TITULO, TIPO_FUERTE, TIPO_CRUZADO = range(len(TIPOS_MATCH))
+
+
+def _format_pct(valores: np.ndarray) -> List[str]:
+    """Formatea similitudes (0-100) como texto con un decimal y '%'"""
+    return [f"{v:.1f}%" for v in valores.tolist()]
+
+
+def _matches_dataframe(registros: List[tuple], rb_artists: List[str], rb_titles: List[str],
+                       disc_index: Dict[str, list]) -> pd.DataFrame:
+    """
+    Construye el DataFrame de resultados a partir de los registros de coincidencias
+    
+    Cada registro es (fila de Rekordbox, disco, tipo, sim_artista, sim_titulo);
+    las columnas se sacan de una vez con indexado de NumPy.
+    """
+    if not registros:
+        return pd.DataFrame()
+    filas, discos, tipos, sim_a, sim_t = (np.asarray(col) for col in zip(*registros))
+    sim_a = sim_a.astype(np.float64)
+    sim_t = sim_t.astype(np.float64)
+    es_titulo = tipos == TIPO_TITULO
+    
+    rb_art = np.asarray(rb_artists, dtype=object)[filas]
+    rb_art_na = np.where(rb_art == '', 'N/A', rb_art)
+    sim_total = np.where(es_titulo, sim_t, (sim_a + sim_t) / 2)
+    return pd.DataFrame({
+        'artista_rekordbox': np.where(es_titulo, rb_art_na, rb_art),
+        'titulo_rekordbox': np.asarray(rb_titles, dtype=object)[filas],
+        'artista_disco': np.asarray(disc_index['artistas'], dtype=object)[discos],
+        'titulo_disco': np.asarray(disc_index['titulos'], dtype=object)[discos],
+        'precio': np.asarray(disc_index['precios'], dtype=object)[discos],
+        'precio_num': np.asarray(disc_index['precios_num'], dtype=np.float64)[discos],
+        'estilos': np.asarray(disc_index['estilos'], dtype=object)[discos],
+        'similitud_artista': np.where(es_titulo, 'N/A', np.asarray(_format_pct(sim_a), dtype=object)),
+        'similitud_titulo': _format_pct(sim_t),
+        'similitud_total': _format_pct(sim_total),
+        'tipo_match': np.asarray(TIPOS_MATCH, dtype=object)[tipos],
+    })
+
+
+def _emit_matches(pares: Dict[str, np.ndarray], rb_artists: List[str], rb_titles: List[str],
+                  disc_index: Dict[str, list], artist_threshold: float, title_threshold: float,
+                  buscar_cruzado: bool, registros: List[tuple], vistos: set):
+    """
+    Clasifica parejas candidatas con los umbrales dados y añade las coincidencias a `registros`
+    
+    Cada coincidencia es una tupla (fila, disco, tipo, sim_artista, sim_titulo);
+    el DataFrame se construye al final con _matches_dataframe. Las parejas
+    deben venir en orden (fila de Rekordbox, disco) para conservar el orden
+    original de los resultados.
+    
+    `vistos` guarda los textos (artista y título de Rekordbox y del disco) de
+    las coincidencias ya añadidas, para descartar cruzadas duplicadas; se
+    comparte entre llamadas sobre los mismos `registros`.
+    """
+    umbral_artista = np.float32(artist_threshold * 100)
+    umbral_titulo = np.float32(title_threshold * 100)
+    solo = pares['solo_titulo']
+    sim_a = pares['sim_artista']
+    sim_t = pares['sim_titulo']
+    
+    titulo = solo & (sim_t >= umbral_titulo)
+    normal = ~solo & (sim_a >= umbral_artista) & (sim_t >= umbral_titulo)
+    # Título muy similar aunque artista no tanto
+    fuerte = ~solo & ~normal & (sim_t >= UMBRAL_TITULO_FUERTE) & (sim_a >= UMBRAL_ARTISTA_FUERTE)
+    if buscar_cruzado:
+        # Artista de Rekordbox con Título de Disco y viceversa
+        cruzado = ~solo & (pares['cruz_artista'] >= umbral_artista) & (pares['cruz_titulo'] >= umbral_titulo)
+    else:
+        cruzado = np.zeros_like(solo)
+    
+    d_artists = disc_index['artistas']
+    d_titles = disc_index['titulos']
+    for p in np.flatnonzero(titulo | normal | fuerte | cruzado):
+        i = int(pares['fila'][p])
+        j = int(pares['disco'][p])
+        clave = (rb_artists[i], rb_titles[i], d_artists[j], d_titles[j])
+        if titulo[p]:
+            registros.append((i, j, TIPO_TITULO, 0.0, float(sim_t[p])))
+            vistos.add(clave)
+            continue
+        if normal[p]:
+            registros.append((i, j, TIPO_NORMAL, float(sim_a[p]), float(sim_t[p])))
+            vistos.add(clave)
+        elif fuerte[p]:
+            registros.append((i, j, TIPO_FUERTE, float(sim_a[p]), float(sim_t[p])))
+            vistos.add(clave)
+        
+        # Cruzada solo si no hay ya una coincidencia con los mismos textos
+        if cruzado[p] and clave not in vistos:
+            registros.append((i, j, TIPO_CRUZADO,
+                              float(pares['cruz_artista'][p]),
+                              float(pares['cruz_titulo'][p])))
+            vistos.add(clave)
 
 
-def similarity_score(str1: str, str2: str) -> float:
-    """Calcula similitud entre dos strings"""
-    return SequenceMatcher(None, normalize_text(str1), normalize_text(str2)).ratio()
+def can_reuse_scores(scores: Dict, artist_threshold: float, title_threshold: float,
+                     buscar_cruzado: bool) -> bool:
+    """
+    Indica si las puntuaciones de una búsqueda anterior sirven para estos parámetros
+    
+    Las parejas guardadas incluyen todo lo que pasaba los umbrales de
+    entonces, así que valen para umbrales iguales o más altos (el
+    resultado es un subconjunto) con las mismas opciones de búsqueda.
+    """
+    if not scores:
+        return False
+    umbral_artista, umbral_titulo = scores['umbrales']
+    return (
+        scores['buscar_cruzado'] == buscar_cruzado and
+        artist_threshold >= umbral_artista and
+        title_threshold >= umbral_titulo
+    )
+
+
+def matches_from_scores(scores: Dict, disc_index: Dict[str, list],
+                        artist_threshold: float, title_threshold: float) -> pd.DataFrame:
+    """
+    Recalcula las coincidencias a partir de las puntuaciones guardadas
+    
+    Solo aplica los umbrales nuevos sobre las parejas candidatas, sin
+    volver a puntuar la matriz N×M (ver can_reuse_scores).
+    
+    Args:
+        scores: Puntuaciones rellenadas por find_matches_with_progress
+        disc_index: Índice del catálogo usado en esa búsqueda
+        artist_threshold: Umbral de similitud para artista (0-1)
+        title_threshold: Umbral de similitud para título (0-1)
+    
+    Returns:
+        DataFrame con las coincidencias
+    """
+    registros = []
+    _emit_matches(scores['pares'], scores['rb_artists'], scores['rb_titles'], disc_index,
+                  artist_threshold, title_threshold, scores['buscar_cruzado'], registros, set())
+    return _matches_dataframe(registros, scores['rb_artists'], scores['rb_titles'], disc_index)
 
 
 def find_matches_with_progress(rekordbox_df: pd.DataFrame, discos_df: pd.DataFrame, 
                                 artist_threshold: float = 0.7, title_threshold: float = 0.7,
-                                buscar_cruzado: bool = False):
+                                buscar_cruzado: bool = False, chunk_size: int = 256,
+                                disc_index: Dict[str, list] = None, scores: Dict = None):
     """
     Encuentra coincidencias con barra de progreso animada
     
+    Las similitudes se calculan por bloques de filas de Rekordbox con
+    rapidfuzz.process.cdist (matriz N×M en C++ y multihilo) en lugar de
+    comparar cada pareja en Python.
+    
     Args:
         rekordbox_df: DataFrame de Rekordbox
         discos_df: DataFrame de discos scrapeados
         artist_threshold: Umbral de similitud para artista (0-1)
         title_threshold: Umbral de similitud para título (0-1)
         buscar_cruzado: Si True, busca también artista de una lista con título de otra
+        chunk_size: Número máximo de filas de Rekordbox procesadas por bloque
+            (se reduce si el catálogo es grande, ver MAX_CELDAS_BLOQUE)
+        disc_index: Índice del catálogo de build_disc_index (se construye si es None)
+        scores: Diccionario opcional que se rellena con las parejas candidatas
+            y sus puntuaciones, para reutilizarlas con matches_from_scores
     
     Yields:
-        Tupla (progreso, matches, tiempo_transcurrido)
+        Tupla (progreso, matches, tiempo_transcurrido): en las actualizaciones
+        intermedias matches es el número de coincidencias encontradas hasta el
+        momento; en la última (progreso 100), el DataFrame de resultados
     """
-    matches = []
+    registros = []
+    vistos = set()
     
     if rekordbox_df.empty or discos_df.empty:
         yield 100, pd.DataFrame(), 0
@@ -150,119 +435,123 @@ def find_matches_with_progress(rekordbox_df: pd.DataFrame, discos_df: pd.DataFra
         yield 100, pd.DataFrame(), 0
         return
     
-    total_items = len(rekordbox_df) * len(discos_df)
-    items_procesados = 0
     inicio = time.time()
     
-    for idx_rb, rekordbox_row in rekordbox_df.iterrows():
-        rekordbox_artist = str(rekordbox_row.get('artista', '')).strip()
-        rekordbox_title = str(rekordbox_row.get('titulo', '')).strip()
-        
-        if not rekordbox_artist and not rekordbox_title:
-            items_procesados += len(discos_df)
-            continue
+    # Textos originales (para mostrar) de Rekordbox
+    rb_artists = rekordbox_df['artista'].fillna('').astype(str).str.strip().tolist()
+    rb_titles = rekordbox_df['titulo'].fillna('').astype(str).str.strip().tolist()
+    
+    # Índice del catálogo (se reutiliza entre búsquedas si se pasa ya construido)
+    if disc_index is None:
+        disc_index = build_disc_index(discos_df)
+    d_artists_norm = disc_index['artistas_norm']
+    d_titles_norm = disc_index['titulos_norm']
+    
+    if not disc_index['artistas']:
+        yield 100, pd.DataFrame(), time.time() - inicio
+        return
+    
+    rb_artists_norm_all = _normalized_column(rekordbox_df, 'artista').tolist()
+    rb_titles_norm_all = _normalized_column(rekordbox_df, 'titulo').tolist()
+    
+    # Umbrales en escala 0-100 (float32 para comparar con la matriz sin errores de redondeo)
+    umbral_artista = np.float32(artist_threshold * 100)
+    umbral_titulo = np.float32(title_threshold * 100)
+    # score_cutoff: por debajo de este valor rapidfuzz devuelve 0 (permite el corte temprano).
+    # rapidfuzz ya descarta por longitud las parejas que no pueden llegar al corte; un
+    # filtro propio por longitudes (sub-bloques con np.ix_) resultó más lento que cdist entero
+    corte_artista = float(min(umbral_artista, UMBRAL_ARTISTA_FUERTE))
+    corte_titulo = float(min(umbral_titulo, UMBRAL_TITULO_FUERTE))
+    
+    # Se pasan str y no bytes ASCII: rapidfuzz ya trata los textos latinos como
+    # arrays de 1 byte y sin `processor` no hace case-folding (bytes no es más rápido)
+    def _cdist(queries, choices, cutoff):
+        return process.cdist(queries, choices, scorer=fuzz.ratio, score_cutoff=cutoff,
+                             dtype=np.float32, workers=-1)
+    
+    # Las pistas sin artista ni título no se comparan: se descartan antes de repartir
+    # en bloques (así tampoco cuentan en el progreso)
+    filas_validas = [i for i in range(len(rb_artists)) if rb_artists[i] or rb_titles[i]]
+    n_rb = len(filas_validas)
+    n_discos = len(disc_index['artistas'])
+    # Cada bloque crea hasta 4 matrices float32 de filas × discos: acotar su tamaño
+    chunk_size = max(1, min(chunk_size, MAX_CELDAS_BLOQUE // n_discos))
+    ultimo_yield = time.monotonic()
+    bloques_pares = []
+    
+    for start in range(0, n_rb, chunk_size):
+        filas = filas_validas[start:start + chunk_size]
         
         # Si solo tenemos título, buscar solo por título
-        search_by_title_only = not rekordbox_artist or rekordbox_artist.lower() in ['unknown', 'desconocido', '']
+        solo_titulo = np.array([
+            not rb_artists[i] or rb_artists[i].lower() in ['unknown', 'desconocido', '']
+            for i in filas
+        ])
+        rb_artists_norm = [rb_artists_norm_all[i] for i in filas]
+        rb_titles_norm = [rb_titles_norm_all[i] for i in filas]
         
-        for idx_disco, disco_row in discos_df.iterrows():
-            disco_artist = str(disco_row.get('artista', '')).strip()
-            disco_title = str(disco_row.get('titulo', '')).strip()
-            
-            if not disco_artist and not disco_title:
-                items_procesados += 1
-                continue
-            
-            # Búsqueda normal
-            if search_by_title_only:
-                title_sim = similarity_score(rekordbox_title, disco_title)
-                if title_sim >= title_threshold:
-                    matches.append({
-                        'artista_rekordbox': rekordbox_artist or 'N/A',
-                        'titulo_rekordbox': rekordbox_title,
-                        'artista_disco': disco_artist,
-                        'titulo_disco': disco_title,
-                        'precio': disco_row.get('precio', 'N/A'),
-                        'estilos': ', '.join(disco_row.get('estilos', [])) if isinstance(disco_row.get('estilos'), list) else str(disco_row.get('estilos', '')),
-                        'similitud_artista': 'N/A',
-                        'similitud_titulo': f"{title_sim*100:.1f}%",
-                        'similitud_total': f"{title_sim*100:.1f}%",
-                        'tipo_match': 'Título'
-                    })
-            else:
-                artist_sim = similarity_score(rekordbox_artist, disco_artist)
-                title_sim = similarity_score(rekordbox_title, disco_title)
-                
-                # Coincidencia normal
-                if artist_sim >= artist_threshold and title_sim >= title_threshold:
-                    matches.append({
-                        'artista_rekordbox': rekordbox_artist,
-                        'titulo_rekordbox': rekordbox_title,
-                        'artista_disco': disco_artist,
-                        'titulo_disco': disco_title,
-                        'precio': disco_row.get('precio', 'N/A'),
-                        'estilos': ', '.join(disco_row.get('estilos', [])) if isinstance(disco_row.get('estilos'), list) else str(disco_row.get('estilos', '')),
-                        'similitud_artista': f"{artist_sim*100:.1f}%",
-                        'similitud_titulo': f"{title_sim*100:.1f}%",
-                        'similitud_total': f"{(artist_sim + title_sim) / 2 * 100:.1f}%",
-                        'tipo_match': 'Normal'
-                    })
-                # Título muy similar aunque artista no tanto
-                elif title_sim >= 0.9 and artist_sim >= 0.5:
-                    matches.append({
-                        'artista_rekordbox': rekordbox_artist,
-                        'titulo_rekordbox': rekordbox_title,
-                        'artista_disco': disco_artist,
-                        'titulo_disco': disco_title,
-                        'precio': disco_row.get('precio', 'N/A'),
-                        'estilos': ', '.join(disco_row.get('estilos', [])) if isinstance(disco_row.get('estilos'), list) else str(disco_row.get('estilos', '')),
-                        'similitud_artista': f"{artist_sim*100:.1f}%",
-                        'similitud_titulo': f"{title_sim*100:.1f}%",
-                        'similitud_total': f"{(artist_sim + title_sim) / 2 * 100:.1f}%",
-                        'tipo_match': 'Título fuerte'
-                    })
-            
-            # Búsqueda cruzada (artista de una lista con título de otra)
-            if buscar_cruzado and not search_by_title_only:
-                # Artista de Rekordbox con Título de Disco
-                artist_rb_title_disco = similarity_score(rekordbox_artist, disco_title)
-                title_rb_artist_disco = similarity_score(rekordbox_title, disco_artist)
-                
-                if artist_rb_title_disco >= artist_threshold and title_rb_artist_disco >= title_threshold:
-                    # Verificar que no sea duplicado
-                    es_duplicado = any(
-                        m.get('artista_rekordbox') == rekordbox_artist and
-                        m.get('titulo_rekordbox') == rekordbox_title and
-                        m.get('artista_disco') == disco_artist and
-                        m.get('titulo_disco') == disco_title
-                        for m in matches
-                    )
-                    
-                    if not es_duplicado:
-                        matches.append({
-                            'artista_rekordbox': rekordbox_artist,
-                            'titulo_rekordbox': rekordbox_title,
-                            'artista_disco': disco_artist,
-                            'titulo_disco': disco_title,
-                            'precio': disco_row.get('precio', 'N/A'),
-                            'estilos': ', '.join(disco_row.get('estilos', [])) if isinstance(disco_row.get('estilos'), list) else str(disco_row.get('estilos', '')),
-                            'similitud_artista': f"{artist_rb_title_disco*100:.1f}%",
-                            'similitud_titulo': f"{title_rb_artist_disco*100:.1f}%",
-                            'similitud_total': f"{(artist_rb_title_disco + title_rb_artist_disco) / 2 * 100:.1f}%",
-                            'tipo_match': 'Cruzado'
-                        })
-            
-            items_procesados += 1
-            
-            # Actualizar progreso cada 50 items o al final
-            if items_procesados % 50 == 0 or items_procesados == total_items:
-                progreso = (items_procesados / total_items) * 100
-                tiempo_transcurrido = time.time() - inicio
-                yield progreso, pd.DataFrame(matches), tiempo_transcurrido
+        con_artista = ~solo_titulo
+        sim_titulo = _cdist(rb_titles_norm, d_titles_norm, corte_titulo)
+        if con_artista.any():
+            sim_artista = _cdist(rb_artists_norm, d_artists_norm, corte_artista)
+        else:
+            sim_artista = np.zeros_like(sim_titulo)
+        
+        # Parejas candidatas: todo lo que puede coincidir con estos umbrales
+        solo_col = solo_titulo[:, None]
+        candidatos = np.where(
+            solo_col,
+            sim_titulo >= umbral_titulo,
+            ((sim_artista >= umbral_artista) & (sim_titulo >= umbral_titulo)) |
+            ((sim_titulo >= UMBRAL_TITULO_FUERTE) & (sim_artista >= UMBRAL_ARTISTA_FUERTE))
+        )
+        
+        if buscar_cruzado and con_artista.any():
+            sim_cruz_artista = _cdist(rb_artists_norm, d_titles_norm, float(umbral_artista))
+            sim_cruz_titulo = _cdist(rb_titles_norm, d_artists_norm, float(umbral_titulo))
+            candidatos |= ((sim_cruz_artista >= umbral_artista) &
+                           (sim_cruz_titulo >= umbral_titulo) & ~solo_col)
+        else:
+            sim_cruz_artista = sim_cruz_titulo = None
+        
+        # np.nonzero recorre en orden (fila, disco): conserva el orden original de resultados
+        ks, js = np.nonzero(candidatos)
+        pares = {
+            'fila': np.asarray(filas, dtype=np.intp)[ks],
+            'disco': js,
+            'solo_titulo': solo_titulo[ks],
+            'sim_artista': sim_artista[ks, js],
+            'sim_titulo': sim_titulo[ks, js],
+            'cruz_artista': sim_cruz_artista[ks, js] if sim_cruz_artista is not None else np.zeros(len(ks), dtype=np.float32),
+            'cruz_titulo': sim_cruz_titulo[ks, js] if sim_cruz_titulo is not None else np.zeros(len(ks), dtype=np.float32),
+        }
+        bloques_pares.append(pares)
+        _emit_matches(pares, rb_artists, rb_titles, disc_index,
+                      artist_threshold, title_threshold, buscar_cruzado, registros, vistos)
+    
+        procesadas = min(start + chunk_size, n_rb)
+        # Limitar las actualizaciones de la UI a una cada ~100 ms
+        if procesadas < n_rb and time.monotonic() - ultimo_yield > 0.1:
+            ultimo_yield = time.monotonic()
+            progreso = (procesadas / n_rb) * 100
+            yield progreso, len(registros), time.time() - inicio
+    
+    if scores is not None:
+        scores.clear()
+        scores.update({
+            'umbrales': (artist_threshold, title_threshold),
+            'buscar_cruzado': buscar_cruzado,
+            'rb_artists': rb_artists,
+            'rb_titles': rb_titles,
+            'pares': {
+                col: (np.concatenate([b[col] for b in bloques_pares]) if bloques_pares else np.empty(0))
+                for col in _COLUMNAS_PARES
+            },
+        })
     
     # Final
     tiempo_total = time.time() - inicio
-    yield 100, pd.DataFrame(matches), tiempo_total
+    yield 100, _matches_dataframe(registros, rb_artists, rb_titles, disc_index), tiempo_total
 
 
 def render_progress_animation(progreso: float, tiempo_transcurrido: float, tiempo_estimado: float = None):
@@ -313,31 +602,21 @@ def render_rekordbox_tab(user_id: str = None):
     
     if uploaded_file is not None:
         try:
-            # Leer archivo con diferentes encodings
+            # Leer archivo detectando su codificación
             file_bytes = uploaded_file.read()
-            content = None
-            
-            # Intentar diferentes encodings
-            encodings = ['utf-8', 'utf-16', 'latin-1', 'cp1252', 'iso-8859-1']
-            
-            for encoding in encodings:
-                try:
-                    content = file_bytes.decode(encoding)
-                    break
-                except UnicodeDecodeError:
-                    continue
-            
-            if content is None:
-                # Si ninguno funciona, usar errors='replace' para ignorar caracteres problemáticos
-                content = file_bytes.decode('utf-8', errors='replace')
+            content = decode_rekordbox_bytes(file_bytes)
             
             rekordbox_df = parse_rekordbox_txt(content)
+            if not rekordbox_df.empty:
+                rekordbox_df = add_normalized_columns(rekordbox_df)
             
             if not rekordbox_df.empty:
                 st.success(f"✅ Archivo cargado correctamente: {len(rekordbox_df)} pistas encontradas")
                 
                 # Guardar en session state y en almacenamiento persistente
                 st.session_state['rekordbox_df'] = rekordbox_df
+                # Versión estable de la lista (hash del archivo) para la caché de puntuaciones
+                st.session_state['rekordbox_version'] = hashlib.sha1(file_bytes).hexdigest()
                 
                 # Guardar de forma persistente
                 if user_id:
@@ -395,6 +674,7 @@ def render_rekordbox_tab(user_id: str = None):
                             clear_rekordbox(user_id)
                             if 'rekordbox_df' in st.session_state:
                                 st.session_state.pop('rekordbox_df')
+                            st.session_state.pop('rekordbox_version', None)
                             st.rerun()
             except Exception as e:
                 pass
@@ -9,12 +9,129 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
-from bs4 import BeautifulSoup
-from typing import List, Dict
+from bs4 import BeautifulSoup, SoupStrainer
+from typing import List, Dict, Optional, Tuple
 from urllib.parse import urlencode
-import time
+import asyncio
+import functools
 import re
+import time
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+try:
+    import h2  # noqa: F401 (soporte HTTP/2 de httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+try:
+    import lxml  # noqa: F401 (parser de BeautifulSoup)
+    LXML_AVAILABLE = True
+except ImportError:
+    LXML_AVAILABLE = False
+
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+# Páginas descargadas a la vez con httpx (para no sobrecargar el servidor)
+MAX_CONCURRENT_PAGES = 4
+
+# Pausa entre páginas pedidas con Selenium (cortesía con el servidor)
+SELENIUM_PAGE_DELAY = 1.0
+
+# Patrones del contador "Page X of Y" y del parámetro page= de los enlaces
+_PAGE_OF_RE = re.compile(r'Page\s+\d+\s+of\s+(\d+)', re.IGNORECASE)
+_PAGE_PARAM_RE = re.compile(r'page=(\d+)')
+
+# Texto de todos los contadores de página del DOM en una sola llamada
+_PAGE_COUNT_JS = """
+return Array.from(document.querySelectorAll('p.pageCount, .pageCount'),
+                  e => e.innerText).join('\\n');
+"""
+
+
+# Clases de los únicos elementos que se leen de cada página (releases y "Page X of Y")
+_PAGE_CLASSES = frozenset({'tile', 'pageCount'})
+
+
+def _is_page_content(class_value) -> bool:
+    """Indica si el atributo class de un elemento incluye 'tile' o 'pageCount'"""
+    return bool(class_value) and not _PAGE_CLASSES.isdisjoint(str(class_value).split())
+
+
+# Solo se construyen nodos para los tiles y el contador de páginas (no cabecera, scripts, etc.)
+_PAGE_STRAINER = SoupStrainer(attrs={'class': _is_page_content})
+
+
+@functools.lru_cache(maxsize=1)
+def _driver_path() -> str:
+    """Ruta del chromedriver (webdriver-manager consulta la red solo la primera vez)"""
+    return ChromeDriverManager().install()
+
+
+def _chrome_options() -> Options:
+    """Opciones de Chrome: headless, sin imágenes ni extensiones y sin esperar a recursos"""
+    chrome_options = Options()
+    chrome_options.add_argument('--headless')  # Ejecutar sin abrir ventana
+    chrome_options.add_argument('--no-sandbox')
+    chrome_options.add_argument('--disable-dev-shm-usage')
+    chrome_options.add_argument('--disable-gpu')
+    chrome_options.add_argument('--disable-extensions')
+    chrome_options.add_argument(f'user-agent={USER_AGENT}')
+    # Las imágenes de las portadas no se usan: no descargarlas
+    chrome_options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+    # driver.get vuelve con el DOM listo, sin esperar imágenes ni hojas de estilo
+    chrome_options.page_load_strategy = 'eager'
+    return chrome_options
+
+
+# Recursos que el scraper nunca usa: portadas, fuentes y vídeos
+BLOCKED_URL_PATTERNS = ['*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg',
+                        '*.woff', '*.woff2', '*.ttf', '*.otf', '*.mp4', '*.webm']
+
+
+def _block_heavy_resources(driver) -> None:
+    """Bloquea en la red del navegador las imágenes, fuentes y vídeos (vía CDP)"""
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+    except Exception as e:
+        # Sin CDP (otro navegador) se sigue con la preferencia de imágenes de _chrome_options
+        print(f"No se pudieron bloquear recursos: {e}")
+
+
+def _make_soup(html: str) -> BeautifulSoup:
+    """Parsea HTML con lxml (en C) si está instalado, o con html.parser"""
+    if LXML_AVAILABLE:
+        try:
+            return BeautifulSoup(html, 'lxml', parse_only=_PAGE_STRAINER)
+        except Exception:
+            # HTML truncado o raro: el parser de Python es más tolerante
+            pass
+    return BeautifulSoup(html, 'html.parser', parse_only=_PAGE_STRAINER)
+
+
+def _is_release_href(href) -> bool:
+    """Indica si un enlace apunta a la ficha de un release"""
+    return bool(href) and '/release/' in href
+
+
+def _is_artist_class(class_value) -> bool:
+    """Indica si una clase CSS hace referencia al artista (artists, artistName...)"""
+    return bool(class_value) and 'artist' in class_value.lower()
+
+
+def _span_or_text(elem) -> str:
+    """Texto del primer <span> del elemento, o del propio elemento si no tiene"""
+    span = elem.find('span')
+    return (span or elem).get_text(strip=True)
 
 
 def _extract_releases_from_page(soup: BeautifulSoup) -> List[Dict[str, str]]:
@@ -29,13 +146,9 @@ def _extract_releases_from_page(soup: BeautifulSoup) -> List[Dict[str, str]]:
     """
     resultados = []
     
-    # Buscar primero con la estructura nueva: div.tile (sin releaseItem)
+    # div.tile cubre también la estructura antigua (div.tile.releaseItem)
     releases = soup.find_all('div', class_='tile')
     
-    # Si no encuentra, buscar con la estructura antigua
-    if not releases:
-        releases = soup.find_all('div', class_='tile releaseItem')
-    
     for release in releases:
         try:
             # Buscar el contenedor artistsAndTitle
@@ -52,18 +165,14 @@ def _extract_releases_from_page(soup: BeautifulSoup) -> List[Dict[str, str]]:
                         artista = artist_name_elem.get_text(strip=True)
                 else:
                     # Fallback: buscar cualquier p con clase artists
-                    artist_elem = release.find('p', class_='artists') or release.find('p', class_=lambda x: x and 'artist' in str(x).lower())
+                    artist_elem = release.find('p', class_='artists') or release.find('p', class_=_is_artist_class)
                     if artist_elem:
-                        artist_span = artist_elem.find('span')
-                        if artist_span:
-                            artista = artist_span.get_text(strip=True)
-                        else:
-                            artista = artist_elem.get_text(strip=True)
+                        artista = _span_or_text(artist_elem)
                     else:
                         artista = "N/A"
                 
                 # Extraer título - está en un <a> > <p> > <span> > <span>
-                title_link = artists_title_container.find('a', href=lambda href: href and '/release/' in str(href))
+                title_link = artists_title_container.find('a', href=_is_release_href)
                 if title_link:
                     title_p = title_link.find('p')
                     if title_p:
@@ -86,32 +195,20 @@ def _extract_releases_from_page(soup: BeautifulSoup) -> List[Dict[str, str]]:
                     # Fallback: buscar p.title
                     title_elem = release.find('p', class_='title')
                     if title_elem:
-                        title_span = title_elem.find('span')
-                        if title_span:
-                            titulo = title_span.get_text(strip=True)
-                        else:
-                            titulo = title_elem.get_text(strip=True)
+                        titulo = _span_or_text(title_elem)
                     else:
                         titulo = "N/A"
             else:
                 # Estructura antigua: buscar p.artists y p.title directamente
                 artist_elem = release.find('p', class_='artists')
                 if artist_elem:
-                    artist_span = artist_elem.find('span')
-                    if artist_span:
-                        artista = artist_span.get_text(strip=True)
-                    else:
-                        artista = artist_elem.get_text(strip=True)
+                    artista = _span_or_text(artist_elem)
                 else:
                     artista = "N/A"
                 
                 title_elem = release.find('p', class_='title')
                 if title_elem:
-                    title_span = title_elem.find('span')
-                    if title_span:
-                        titulo = title_span.get_text(strip=True)
-                    else:
-                        titulo = title_elem.get_text(strip=True)
+                    titulo = _span_or_text(title_elem)
                 else:
                     titulo = "N/A"
             
@@ -148,56 +245,34 @@ def _get_total_pages(soup: BeautifulSoup, driver) -> int:
         Número total de páginas, o 1 si no se puede detectar
     """
     try:
-        # Primero intentar con Selenium buscando el elemento pageCount
-        try:
-            page_count_elements = driver.find_elements(By.CSS_SELECTOR, "p.pageCount, .pageCount")
-            for elem in page_count_elements:
-                text = elem.text
-                # Buscar patrón "Page X of Y"
-                match = re.search(r'Page\s+\d+\s+of\s+(\d+)', text, re.IGNORECASE)
-                if match:
-                    return int(match.group(1))
-        except Exception as e:
-            print(f"Error buscando pageCount con Selenium: {e}")
-        
-        # Buscar en el HTML parseado el elemento con clase pageCount
+        # Primero en el HTML ya parseado (sin ida y vuelta al navegador)
         page_count_elem = soup.find('p', class_='pageCount')
         if not page_count_elem:
             page_count_elem = soup.find(class_='pageCount')
         
         if page_count_elem:
-            text = page_count_elem.get_text()
             # Buscar patrón "Page X of Y"
-            match = re.search(r'Page\s+\d+\s+of\s+(\d+)', text, re.IGNORECASE)
+            match = _PAGE_OF_RE.search(page_count_elem.get_text())
             if match:
                 return int(match.group(1))
         
-        # Buscar en cualquier elemento que contenga "Page" y "of"
+        # Después en el DOM, con una sola llamada JS (por si el contador se pinta tarde)
         try:
-            page_elements = driver.find_elements(By.XPATH, "//*[contains(text(), 'Page') and contains(text(), 'of')]")
-            for elem in page_elements:
-                text = elem.text
-                match = re.search(r'Page\s+\d+\s+of\s+(\d+)', text, re.IGNORECASE)
-                if match:
-                    return int(match.group(1))
-        except:
-            pass
-        
-        # Buscar en el HTML parseado cualquier texto con "Page X of Y"
-        all_texts = soup.find_all(text=True)
-        for text in all_texts:
-            if 'Page' in text and 'of' in text:
-                match = re.search(r'Page\s+\d+\s+of\s+(\d+)', text, re.IGNORECASE)
-                if match:
-                    return int(match.group(1))
+            text = driver.execute_script(_PAGE_COUNT_JS)
+            match = _PAGE_OF_RE.search(text or '')
+            if match:
+                return int(match.group(1))
+        except Exception as e:
+            print(f"Error buscando pageCount con Selenium: {e}")
         
-        # Como último recurso, buscar enlaces de paginación
-        page_links = soup.find_all('a', href=lambda href: href and 'page=' in str(href))
+        # Como último recurso, buscar enlaces de paginación en el DOM
+        # (el HTML parseado solo contiene los tiles y el pageCount)
+        page_links = driver.find_elements(By.CSS_SELECTOR, "a[href*='page=']")
         if page_links:
             max_page = 1
             for link in page_links:
-                href = link.get('href', '')
-                match = re.search(r'page=(\d+)', str(href))
+                href = link.get_attribute('href') or ''
+                match = _PAGE_PARAM_RE.search(href)
                 if match:
                     page_num = int(match.group(1))
                     max_page = max(max_page, page_num)
@@ -210,6 +285,83 @@ def _get_total_pages(soup: BeautifulSoup, driver) -> int:
     return 1  # Por defecto, solo una página
 
 
+def _parse_releases(html: str) -> List[Dict[str, str]]:
+    """Parsea el HTML de una página y extrae sus releases"""
+    return _extract_releases_from_page(_make_soup(html))
+
+
+async def _fetch_page_releases(client, semaphore: asyncio.Semaphore, url: str) -> List[Dict[str, str]]:
+    """
+    Descarga una página del catálogo y extrae sus releases
+    El parseo va a un hilo para no bloquear el event loop mientras llegan las demás páginas
+    
+    Returns:
+        Lista de releases (vacía si la descarga falla o la página no trae tiles)
+    """
+    async with semaphore:
+        try:
+            response = await client.get(url)
+            response.raise_for_status()
+            html = response.text
+        except httpx.HTTPError as e:
+            print(f"Error descargando {url}: {e}")
+            return []
+    return await asyncio.to_thread(_parse_releases, html)
+
+
+async def _fetch_pages_releases(urls: List[str]) -> List[List[Dict[str, str]]]:
+    """
+    Descarga y parsea páginas del catálogo de forma concurrente, en el mismo orden
+    
+    La primera página se pide sola y el resto por tandas de MAX_CONCURRENT_PAGES.
+    En cuanto una página vuelve sin releases (contenido renderizado por JS) se deja
+    de usar httpx, para no descargar cada página dos veces (httpx y Selenium)
+    
+    Returns:
+        Releases de las páginas descargadas, en orden; puede tener menos elementos
+        que urls (las que faltan se piden con Selenium)
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_PAGES)
+    # Un único cliente para todas las páginas: conexiones reutilizadas (y multiplexadas con HTTP/2)
+    limits = httpx.Limits(max_connections=MAX_CONCURRENT_PAGES,
+                          max_keepalive_connections=MAX_CONCURRENT_PAGES)
+    resultados = []
+    async with httpx.AsyncClient(headers={'User-Agent': USER_AGENT}, timeout=15,
+                                 follow_redirects=True, http2=HTTP2_AVAILABLE,
+                                 limits=limits) as client:
+        inicio, tanda = 0, 1
+        while inicio < len(urls):
+            paginas = await asyncio.gather(*(_fetch_page_releases(client, semaphore, url)
+                                             for url in urls[inicio:inicio + tanda]))
+            resultados.extend(paginas)
+            if not all(paginas):
+                break
+            inicio, tanda = inicio + tanda, MAX_CONCURRENT_PAGES
+    return resultados
+
+
+def _wait_for_tiles(wait: WebDriverWait) -> None:
+    """
+    Espera a que el documento esté cargado y aparezcan los releases
+    Si no aparecen antes del timeout se sigue sin más espera (la página no tiene tiles)
+    """
+    try:
+        wait.until(lambda d: d.execute_script('return document.readyState') != 'loading')
+        wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div.tile, .tile.releaseItem, .releaseItem")))
+    except TimeoutException:
+        print("Timeout esperando los releases de la página")
+
+
+def _scrape_page_selenium(driver, wait: WebDriverWait, url: str) -> List[Dict[str, str]]:
+    """Carga una página con Selenium y extrae sus releases"""
+    driver.get(url)
+    _wait_for_tiles(wait)
+    
+    # Obtener HTML de la página
+    soup = _make_soup(driver.page_source)
+    return _extract_releases_from_page(soup)
+
+
 def scrape_discos_paradiso(styles: List[str] = None) -> List[Dict[str, str]]:
     """
     Hace scraping de discosparadiso.com con los filtros especificados
@@ -229,21 +381,16 @@ def scrape_discos_paradiso(styles: List[str] = None) -> List[Dict[str, str]]:
         for style in styles:
             param_list.append(('styles', style))
     
-    # Configurar Selenium con Chrome
-    chrome_options = Options()
-    chrome_options.add_argument('--headless')  # Ejecutar sin abrir ventana
-    chrome_options.add_argument('--no-sandbox')
-    chrome_options.add_argument('--disable-dev-shm-usage')
-    chrome_options.add_argument('--disable-gpu')
-    chrome_options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
-    
     driver = None
     todos_resultados = []
     
     try:
-        # Inicializar el driver con webdriver-manager
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=chrome_options)
+        # Inicializar el driver (la ruta de webdriver-manager se resuelve una vez por proceso)
+        service = Service(_driver_path())
+        driver = webdriver.Chrome(service=service, options=_chrome_options())
+        # Solo esperas explícitas: una espera implícita se sumaría a cada find_elements
+        driver.implicitly_wait(0)
+        _block_heavy_resources(driver)
         
         # Primero cargar la página 1 para detectar el total de páginas
         query_string = urlencode(param_list)
@@ -252,18 +399,13 @@ def scrape_discos_paradiso(styles: List[str] = None) -> List[Dict[str, str]]:
         
         driver.get(url_pagina1)
         
-        # Esperar a que se cargue el contenido
-        wait = WebDriverWait(driver, 15)
-        try:
-            # Buscar div.tile o div.tile.releaseItem
-            wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div.tile, .tile.releaseItem, .releaseItem")))
-        except:
-            # Si no encuentra, esperar un tiempo fijo para que cargue
-            time.sleep(5)
+        # Esperar a que se cargue el contenido (comprobando cada 100 ms)
+        wait = WebDriverWait(driver, 15, poll_frequency=0.1)
+        _wait_for_tiles(wait)
         
         # Obtener HTML de la primera página
         html = driver.page_source
-        soup = BeautifulSoup(html, 'html.parser')
+        soup = _make_soup(html)
         
         # Extraer releases de la página 1
         resultados_pag1 = _extract_releases_from_page(soup)
@@ -276,32 +418,28 @@ def scrape_discos_paradiso(styles: List[str] = None) -> List[Dict[str, str]]:
         
         # Recorrer las páginas restantes (si hay más de 1)
         if total_pages > 1:
+            urls = []
             for page_num in range(2, total_pages + 1):
                 # Construir URL con parámetro page
                 page_params = param_list + [('page', str(page_num))]
-                query_string = urlencode(page_params)
-                url = f"{base_url}?{query_string}"
-                print(f"Scrapeando página {page_num}/{total_pages}: {url}")
-                
-                driver.get(url)
-                
-                # Esperar a que se cargue el contenido
-                try:
-                    wait.until(EC.presence_of_element_located((By.CSS_SELECTOR, "div.tile, .tile.releaseItem, .releaseItem")))
-                except:
-                    time.sleep(3)
-                
-                # Obtener HTML de la página
-                html = driver.page_source
-                soup = BeautifulSoup(html, 'html.parser')
+                urls.append(f"{base_url}?{urlencode(page_params)}")
+            
+            # Descargar las páginas con httpx; Selenium para las que fallen o no se llegaron a pedir
+            paginas = []
+            if HTTPX_AVAILABLE:
+                print(f"Descargando páginas 2-{total_pages} con httpx...")
+                paginas = asyncio.run(_fetch_pages_releases(urls))
+            
+            for idx, (page_num, url) in enumerate(zip(range(2, total_pages + 1), urls)):
+                resultados_pag = paginas[idx] if idx < len(paginas) else []
+                if not resultados_pag:
+                    # Sin HTML o sin releases (contenido renderizado por JS): usar el navegador
+                    print(f"Scrapeando página {page_num}/{total_pages} con Selenium: {url}")
+                    time.sleep(SELENIUM_PAGE_DELAY)
+                    resultados_pag = _scrape_page_selenium(driver, wait, url)
                 
-                # Extraer releases
-                resultados_pag = _extract_releases_from_page(soup)
                 todos_resultados.extend(resultados_pag)
                 print(f"Página {page_num}: {len(resultados_pag)} discos encontrados")
-                
-                # Pequeña pausa entre páginas para no sobrecargar el servidor
-                time.sleep(1)
         
         print(f"\nTotal de discos encontrados: {len(todos_resultados)}")
         return todos_resultados
@@ -314,45 +452,48 @@ def scrape_discos_paradiso(styles: List[str] = None) -> List[Dict[str, str]]:
             driver.quit()
 
 
-def get_available_styles() -> List[str]:
+# Estilos disponibles para Electronic (lista estática basada en los estilos comunes del sitio)
+AVAILABLE_STYLES = (
+    'Downtempo',
+    'Ambient',
+    'Experimental',
+    'Techno',
+    'Dub',
+    'House',
+    'Leftfield',
+    'Electro',
+    'Abstract',
+    'IDM',
+    'Disco',
+    'Balearic',
+    'Breaks',
+    'Breakbeat',
+    'Trance',
+    'Tech House',
+    'Tribal',
+    'Trip Hop',
+    'Deep House',
+    'Synth-pop',
+    'Industrial',
+    'Jungle',
+    'Drum n Bass',
+    'Dub Techno',
+    'Acid',
+    'Acid House',
+    'Future Jazz',
+    'Instrumental',
+    'Fusion',
+    'EBM',
+    'Minimal',
+    'Jazzy Hip-Hop',
+    'Krautrock',
+    'Funk',
+)
+
+
+def get_available_styles() -> Tuple[str, ...]:
     """
-    Retorna una lista de estilos disponibles para Electronic
-    (Lista estática basada en los estilos comunes del sitio)
+    Retorna los estilos disponibles para Electronic
+    (Tupla constante: no se reconstruye en cada rerun de Streamlit)
     """
-    return [
-        'Downtempo',
-        'Ambient',
-        'Experimental',
-        'Techno',
-        'Dub',
-        'House',
-        'Leftfield',
-        'Electro',
-        'Abstract',
-        'IDM',
-        'Disco',
-        'Balearic',
-        'Breaks',
-        'Breakbeat',
-        'Trance',
-        'Tech House',
-        'Tribal',
-        'Trip Hop',
-        'Deep House',
-        'Synth-pop',
-        'Industrial',
-        'Jungle',
-        'Drum n Bass',
-        'Dub Techno',
-        'Acid',
-        'Acid House',
-        'Future Jazz',
-        'Instrumental',
-        'Fusion',
-        'EBM',
-        'Minimal',
-        'Jazzy Hip-Hop',
-        'Krautrock',
-        'Funk'
-    ]
-
+    return AVAILABLE_STYLES
@@ -7,15 +7,31 @@ import streamlit as st
 import pandas as pd
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
+from spotipy.cache_handler import CacheHandler
 import os
 import time
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Optional, Tuple, Union
 from urllib.parse import urlparse, parse_qs
 
+from data_storage import DATA_DIR, PARQUET_COMPRESSION, PARQUET_COMPRESSION_LEVEL
+from utils import df_to_csv_bytes, df_to_parquet_bytes
+
+
+class SessionCacheHandler(CacheHandler):
+    """Guarda el token OAuth de Spotify (con refresh token y caducidad) en st.session_state"""
+    
+    def get_cached_token(self):
+        return st.session_state.get('spotify_token_info')
+    
+    def save_token_to_cache(self, token_info):
+        st.session_state['spotify_token_info'] = token_info
+
 
 def get_spotify_client() -> Optional[spotipy.Spotify]:
     """
     Obtiene un cliente de Spotify autenticado
+    Si el token de acceso ha caducado se renueva con el refresh token en lugar de pedir reautorizar
     
     Returns:
         Cliente de Spotify o None si no está autenticado
@@ -24,8 +40,28 @@ def get_spotify_client() -> Optional[spotipy.Spotify]:
     if 'spotify_token' not in st.session_state:
         return None
     
+    auth_manager = st.session_state.get('spotify_auth_manager')
+    if auth_manager is not None:
+        try:
+            token_info = auth_manager.validate_token(auth_manager.cache_handler.get_cached_token())
+            if token_info:
+                st.session_state['spotify_token'] = token_info['access_token']
+        except Exception as e:
+            # Refresh token revocado o caducado: el token de acceso ya no sirve, volver al login
+            for key in ('spotify_token', 'spotify_token_info', 'spotify_client', 'spotify_client_token'):
+                st.session_state.pop(key, None)
+            st.warning(f"La sesión de Spotify ha caducado, vuelve a conectar: {str(e)}")
+            return None
+    
+    # Reutilizar el cliente (y su requests.Session con conexiones abiertas) mientras el token no cambie
+    token = st.session_state['spotify_token']
+    if st.session_state.get('spotify_client_token') == token and 'spotify_client' in st.session_state:
+        return st.session_state['spotify_client']
+    
     try:
-        sp = spotipy.Spotify(auth=st.session_state['spotify_token'])
+        sp = spotipy.Spotify(auth=token)
+        st.session_state['spotify_client'] = sp
+        st.session_state['spotify_client_token'] = token
         return sp
     except:
         return None
@@ -54,7 +90,7 @@ def get_auth_url(client_id: str, client_secret: str, redirect_uri: str) -> str:
             client_secret=client_secret,
             redirect_uri=redirect_uri,
             scope=scope,
-            cache_path=None,
+            cache_handler=SessionCacheHandler(),
             show_dialog=True
         )
         
@@ -116,6 +152,40 @@ def process_callback_url(callback_url: str) -> bool:
         return False
 
 
+# Páginas de la API de Spotify pedidas a la vez (spotipy ya reintenta los 429 respetando Retry-After)
+SPOTIFY_WORKERS = 8
+
+
+# Campos pedidos a /playlists/{id}/tracks: solo lo que se usa (la respuesta completa es mucho mayor)
+PLAYLIST_TRACK_FIELDS = 'total,items(track(id,name,duration_ms,external_urls(spotify),album(name),artists(name)))'
+
+
+def _fetch_all_items(fetch_page: Callable[[int], Dict], limit: int) -> List[Dict]:
+    """
+    Descarga todas las páginas de un listado paginado de Spotify
+    La primera respuesta trae 'total', así que el resto de offsets se piden en paralelo
+    
+    Args:
+        fetch_page: Función que recibe el offset y devuelve la respuesta de la API
+        limit: Tamaño de página usado por fetch_page
+    
+    Returns:
+        Lista de items en el mismo orden que la API
+    """
+    first = fetch_page(0)
+    items = list(first['items'])
+    offsets = range(limit, first['total'], limit)
+    if offsets:
+        with ThreadPoolExecutor(max_workers=min(SPOTIFY_WORKERS, len(offsets))) as executor:
+            for page in executor.map(fetch_page, offsets):
+                items.extend(page['items'])
+    
+    # Avisar si la API devuelve menos elementos de los que anuncia (páginas truncadas)
+    if len(items) < first['total']:
+        st.warning(f"⚠️ Spotify anunció {first['total']} elementos pero solo devolvió {len(items)}")
+    return items
+
+
 def get_user_playlists(sp: spotipy.Spotify) -> List[Dict]:
     """
     Obtiene todas las playlists del usuario
@@ -126,120 +196,254 @@ def get_user_playlists(sp: spotipy.Spotify) -> List[Dict]:
     Returns:
         Lista de diccionarios con información de playlists
     """
-    playlists = []
     try:
-        results = sp.current_user_playlists(limit=50)
-        
-        while results:
-            for playlist in results['items']:
-                playlists.append({
-                    'nombre': playlist['name'],
-                    'id': playlist['id'],
-                    'canciones': playlist['tracks']['total'],
-                    'publica': playlist['public'],
-                    'url': playlist['external_urls']['spotify']
-                })
-            
-            if results['next']:
-                results = sp.next(results)
-            else:
-                break
+        return _fetch_user_playlists(sp)
     except Exception as e:
         st.error(f"Error al cargar playlists: {str(e)}")
+        return []
+
+
+def _fetch_user_playlists(sp: spotipy.Spotify) -> List[Dict]:
+    """Descarga las playlists del usuario; a diferencia de get_user_playlists, propaga los errores"""
+    items = _fetch_all_items(lambda offset: sp.current_user_playlists(limit=50, offset=offset), 50)
+    return [
+        {
+            'nombre': playlist['name'],
+            'id': playlist['id'],
+            'canciones': playlist['tracks']['total'],
+            'publica': playlist['public'],
+            'url': playlist['external_urls']['spotify']
+        }
+        for playlist in items
+    ]
+
+
+# Estadísticas de audio en porcentaje o redondeadas: columna -> (campo de Spotify, factor)
+_SCALED_FEATURES = {
+    'energia': ('energy', 100),
+    'danceability': ('danceability', 100),
+    'valence': ('valence', 100),
+    'acousticness': ('acousticness', 100),
+    'instrumentalness': ('instrumentalness', 100),
+    'liveness': ('liveness', 100),
+    'speechiness': ('speechiness', 100),
+    'tempo': ('tempo', 1),
+}
+
+
+def _track_columns(tracks: List[Dict]) -> Dict[str, list]:
+    """
+    Columnas básicas de las canciones como listas paralelas (sin un dict por fila)
+    
+    Args:
+        tracks: Objetos track de la API de Spotify
     
-    return playlists
+    Returns:
+        Diccionario columna -> lista de valores
+    """
+    return {
+        'artista': [', '.join([artist['name'] for artist in track['artists']]) for track in tracks],
+        'titulo': [track['name'] for track in tracks],
+        'album': [track['album']['name'] for track in tracks],
+        'duracion_ms': [track['duration_ms'] for track in tracks],
+        'url': [track['external_urls']['spotify'] for track in tracks],
+        'id': [track['id'] for track in tracks],
+    }
+
 
+# Caché en disco de estadísticas de audio por ID de canción (compartida entre usuarios)
+FEATURES_CACHE_FILE = os.path.join(DATA_DIR, "spotify_features_cache.parquet")
+FEATURE_FIELDS = [field for field, _ in _SCALED_FEATURES.values()] + ['key', 'mode', 'time_signature']
+_FEATURES_CACHE: Dict[str, Dict] = {}
+_FEATURES_CACHE_LOADED = False
+
+
+def load_features_cache() -> Dict[str, Dict]:
+    """Carga la caché de estadísticas de audio desde disco (solo la primera vez)"""
+    global _FEATURES_CACHE_LOADED
+    if _FEATURES_CACHE_LOADED:
+        return _FEATURES_CACHE
+    _FEATURES_CACHE_LOADED = True
+    if not os.path.exists(FEATURES_CACHE_FILE):
+        return _FEATURES_CACHE
+    try:
+        df = pd.read_parquet(FEATURES_CACHE_FILE, engine='pyarrow')
+    except Exception:
+        return _FEATURES_CACHE
+    for record in df.to_dict('records'):
+        track_id = record.pop('id')
+        # Los nulos de Parquet vuelven como NaN/NA: restaurar None como en la respuesta de la API
+        _FEATURES_CACHE[track_id] = {k: (None if pd.isna(v) else v) for k, v in record.items()}
+    return _FEATURES_CACHE
 
-def get_playlist_tracks(sp: spotipy.Spotify, playlist_id: str, include_features: bool = True) -> List[Dict]:
+
+def save_features_cache():
+    """Guarda la caché de estadísticas de audio en disco de forma atómica"""
+    if not _FEATURES_CACHE:
+        return
+    df = pd.DataFrame.from_dict(_FEATURES_CACHE, orient='index', columns=FEATURE_FIELDS)
+    df.index.name = 'id'
+    # Enteros con nulos como Int64 para que no vuelvan como float
+    df = df.reset_index().astype({'key': 'Int64', 'mode': 'Int64', 'time_signature': 'Int64'})
+    os.makedirs(DATA_DIR, exist_ok=True)
+    tmp = FEATURES_CACHE_FILE + ".tmp"
+    try:
+        df.to_parquet(
+            tmp, engine='pyarrow', index=False,
+            compression=PARQUET_COMPRESSION, compression_level=PARQUET_COMPRESSION_LEVEL
+        )
+        os.replace(tmp, FEATURES_CACHE_FILE)
+    except Exception:
+        # La caché es opcional: si no se puede guardar, se vuelven a pedir a la API
+        pass
+
+
+def _fetch_features_batch(sp: spotipy.Spotify, batch: List[str]) -> Tuple[Optional[List[Dict]], Optional[Exception]]:
+    """Pide las estadísticas de audio de un lote de IDs; devuelve (features, error)"""
+    try:
+        return sp.audio_features(batch), None
+    except Exception as e:
+        return None, e
+
+
+def _audio_feature_columns(sp: spotipy.Spotify, track_ids: List[Optional[str]]) -> Dict[str, list]:
     """
-    Obtiene las canciones de una playlist con estadísticas de audio
+    Descarga las estadísticas de audio y las devuelve como columnas alineadas con track_ids
     
     Args:
         sp: Cliente de Spotify autenticado
-        playlist_id: ID de la playlist
+        track_ids: IDs de las canciones (None para canciones locales)
+    
+    Returns:
+        Diccionario columna -> lista de valores (None si la canción no tiene estadísticas),
+        vacío si no hay ningún ID válido
+    """
+    if not any(track_ids):
+        return {}
+    
+    # Las estadísticas de una canción no cambian: solo se piden las que no están en caché
+    features_cache = load_features_cache()
+    missing_ids = list(dict.fromkeys(tid for tid in track_ids if tid and tid not in features_cache))
+    
+    if missing_ids:
+        # Spotify API limita a 100 tracks por request; los lotes se piden en paralelo
+        batches = [missing_ids[i:i+100] for i in range(0, len(missing_ids), 100)]
+        with ThreadPoolExecutor(max_workers=min(SPOTIFY_WORKERS, len(batches))) as executor:
+            resultados = list(executor.map(lambda batch: _fetch_features_batch(sp, batch), batches))
+        
+        nuevas = 0
+        for n_batch, (features, error) in enumerate(resultados, start=1):
+            if error is not None:
+                # Los avisos se muestran desde el hilo principal (Streamlit no pinta desde los workers)
+                st.warning(f"Error al obtener features para batch {n_batch}: {str(error)}")
+            elif features:
+                for f in features:
+                    if f and f.get('id'):  # Filtrar None
+                        features_cache[f['id']] = {field: f.get(field) for field in FEATURE_FIELDS}
+                        nuevas += 1
+        if nuevas:
+            save_features_cache()
+    
+    # Mapear features a tracks
+    feats = [features_cache.get(tid) if tid else None for tid in track_ids]
+    
+    columns = {
+        column: [round(feat[field] * factor, 1) if feat is not None and feat.get(field) is not None else None
+                 for feat in feats]
+        for column, (field, factor) in _SCALED_FEATURES.items()
+    }
+    columns['key'] = [feat.get('key') if feat is not None else None for feat in feats]
+    columns['mode'] = [
+        ('Mayor' if feat.get('mode') == 1 else 'Menor' if feat.get('mode') == 0 else None) if feat is not None else None
+        for feat in feats
+    ]
+    columns['time_signature'] = [feat.get('time_signature') if feat is not None else None for feat in feats]
+    return columns
+
+
+def _shrink_feature_columns(df_tracks: pd.DataFrame):
+    """Estadísticas de audio como float32: redondeadas a un decimal, no necesitan float64"""
+    for column in _SCALED_FEATURES:
+        if column in df_tracks.columns:
+            df_tracks[column] = df_tracks[column].astype('float32')
+
+
+def _tracks_frame(columns: Dict[str, list]) -> pd.DataFrame:
+    """DataFrame de canciones con tipos compactos (artista y álbum categóricos, duración int32)"""
+    df_tracks = pd.DataFrame(columns)
+    for column in ('artista', 'album'):
+        if column in df_tracks.columns:
+            df_tracks[column] = df_tracks[column].astype('category')
+    if 'duracion_ms' in df_tracks.columns:
+        df_tracks['duracion_ms'] = df_tracks['duracion_ms'].astype('int32')
+    _shrink_feature_columns(df_tracks)
+    return df_tracks
+
+
+def _get_tracks(sp: spotipy.Spotify, fetch_page: Callable[[int], Dict], limit: int,
+                include_features: bool, error_msg: str) -> pd.DataFrame:
+    """
+    Descarga un listado paginado de canciones (playlist o guardadas) con estadísticas de audio opcionales
+    
+    Args:
+        sp: Cliente de Spotify autenticado
+        fetch_page: Función que recibe el offset y devuelve la respuesta de la API
+        limit: Tamaño de página usado por fetch_page
         include_features: Si incluir estadísticas de audio
+        error_msg: Texto del error que se muestra si falla la descarga
     
     Returns:
-        Lista de diccionarios con información de canciones
+        DataFrame con una fila por canción
     """
-    tracks = []
-    track_ids = []
     try:
-        results = sp.playlist_tracks(playlist_id, limit=100)
-        
-        while results:
-            for item in results['items']:
-                if item['track'] and item['track'] is not None:
-                    track = item['track']
-                    track_data = {
-                        'artista': ', '.join([artist['name'] for artist in track['artists']]),
-                        'titulo': track['name'],
-                        'album': track['album']['name'],
-                        'duracion_ms': track['duration_ms'],
-                        'url': track['external_urls']['spotify'],
-                        'id': track['id']
-                    }
-                    tracks.append(track_data)
-                    if track['id']:
-                        track_ids.append(track['id'])
-            
-            if results['next']:
-                results = sp.next(results)
-            else:
-                break
-        
-        # Obtener audio features si se solicita
-        if include_features and track_ids:
-            # Filtrar None IDs
-            valid_track_ids = [tid for tid in track_ids if tid]
-            
-            if valid_track_ids:
-                # Spotify API limita a 100 tracks por request
-                features_batch = []
-                for i in range(0, len(valid_track_ids), 100):
-                    batch = valid_track_ids[i:i+100]
-                    try:
-                        features = sp.audio_features(batch)
-                        if features:
-                            features_batch.extend([f for f in features if f])  # Filtrar None
-                    except Exception as e:
-                        st.warning(f"Error al obtener features para batch {i//100 + 1}: {str(e)}")
-                
-                # Mapear features a tracks
-                features_dict = {f['id']: f for f in features_batch if f and f.get('id')}
-                
-                # Añadir estadísticas a todas las canciones (con valores por defecto si no hay)
-                for track in tracks:
-                    if track.get('id') and track['id'] in features_dict:
-                        feat = features_dict[track['id']]
-                        track.update({
-                            'energia': round(feat.get('energy', 0) * 100, 1) if feat.get('energy') is not None else None,
-                            'danceability': round(feat.get('danceability', 0) * 100, 1) if feat.get('danceability') is not None else None,
-                            'valence': round(feat.get('valence', 0) * 100, 1) if feat.get('valence') is not None else None,
-                            'acousticness': round(feat.get('acousticness', 0) * 100, 1) if feat.get('acousticness') is not None else None,
-                            'instrumentalness': round(feat.get('instrumentalness', 0) * 100, 1) if feat.get('instrumentalness') is not None else None,
-                            'liveness': round(feat.get('liveness', 0) * 100, 1) if feat.get('liveness') is not None else None,
-                            'speechiness': round(feat.get('speechiness', 0) * 100, 1) if feat.get('speechiness') is not None else None,
-                            'tempo': round(feat.get('tempo', 0), 1) if feat.get('tempo') is not None else None,
-                            'key': feat.get('key'),
-                            'mode': 'Mayor' if feat.get('mode') == 1 else 'Menor' if feat.get('mode') == 0 else None,
-                            'time_signature': feat.get('time_signature')
-                        })
-                    else:
-                        # Añadir None para tracks sin features
-                        track.update({
-                            'energia': None, 'danceability': None, 'valence': None,
-                            'acousticness': None, 'instrumentalness': None, 'liveness': None,
-                            'speechiness': None, 'tempo': None, 'key': None,
-                            'mode': None, 'time_signature': None
-                        })
+        return _fetch_tracks(sp, fetch_page, limit, include_features)
     except Exception as e:
-        st.error(f"Error al cargar canciones: {str(e)}")
+        st.error(f"{error_msg}: {str(e)}")
+        return _tracks_frame({})
+
+
+def _fetch_tracks(sp: spotipy.Spotify, fetch_page: Callable[[int], Dict], limit: int,
+                  include_features: bool) -> pd.DataFrame:
+    """Descarga un listado paginado de canciones; a diferencia de _get_tracks, propaga los errores"""
+    items = _fetch_all_items(fetch_page, limit)
     
-    return tracks
+    # Las canciones eliminadas o no disponibles llegan como track None
+    columns = _track_columns([item['track'] for item in items if item['track']])
+    
+    # Obtener audio features si se solicita
+    if include_features:
+        columns.update(_audio_feature_columns(sp, columns['id']))
+    
+    return _tracks_frame(columns)
+
+
+def _playlist_page_fetcher(sp: spotipy.Spotify, playlist_id: str) -> Callable[[int], Dict]:
+    """Función de página (por offset) de las canciones de una playlist, de 100 en 100"""
+    return lambda offset: sp.playlist_tracks(playlist_id, fields=PLAYLIST_TRACK_FIELDS, limit=100, offset=offset)
 
 
-def get_saved_tracks(sp: spotipy.Spotify, include_features: bool = True) -> List[Dict]:
+def _saved_page_fetcher(sp: spotipy.Spotify) -> Callable[[int], Dict]:
+    """Función de página (por offset) de las canciones guardadas, de 50 en 50"""
+    return lambda offset: sp.current_user_saved_tracks(limit=50, offset=offset)
+
+
+def get_playlist_tracks(sp: spotipy.Spotify, playlist_id: str, include_features: bool = True) -> pd.DataFrame:
+    """
+    Obtiene las canciones de una playlist con estadísticas de audio
+    
+    Args:
+        sp: Cliente de Spotify autenticado
+        playlist_id: ID de la playlist
+        include_features: Si incluir estadísticas de audio
+    
+    Returns:
+        DataFrame con una fila por canción
+    """
+    return _get_tracks(sp, _playlist_page_fetcher(sp, playlist_id), 100, include_features,
+                       "Error al cargar canciones")
+
+
+def get_saved_tracks(sp: spotipy.Spotify, include_features: bool = True) -> pd.DataFrame:
     """
     Obtiene las canciones guardadas del usuario con estadísticas de audio
     
@@ -248,82 +452,184 @@ def get_saved_tracks(sp: spotipy.Spotify, include_features: bool = True) -> List
         include_features: Si incluir estadísticas de audio
     
     Returns:
-        Lista de diccionarios con información de canciones
+        DataFrame con una fila por canción
     """
-    tracks = []
-    track_ids = []
-    try:
-        results = sp.current_user_saved_tracks(limit=50)
-        
-        while results:
-            for item in results['items']:
-                track = item['track']
-                track_data = {
-                    'artista': ', '.join([artist['name'] for artist in track['artists']]),
-                    'titulo': track['name'],
-                    'album': track['album']['name'],
-                    'duracion_ms': track['duration_ms'],
-                    'url': track['external_urls']['spotify'],
-                    'id': track['id']
-                }
-                tracks.append(track_data)
-                if track['id']:
-                    track_ids.append(track['id'])
-            
-            if results['next']:
-                results = sp.next(results)
-            else:
-                break
-        
-        # Obtener audio features si se solicita
-        if include_features and track_ids:
-            # Filtrar None IDs
-            valid_track_ids = [tid for tid in track_ids if tid]
-            
-            if valid_track_ids:
-                # Spotify API limita a 100 tracks por request
-                features_batch = []
-                for i in range(0, len(valid_track_ids), 100):
-                    batch = valid_track_ids[i:i+100]
-                    try:
-                        features = sp.audio_features(batch)
-                        if features:
-                            features_batch.extend([f for f in features if f])  # Filtrar None
-                    except Exception as e:
-                        st.warning(f"Error al obtener features para batch {i//100 + 1}: {str(e)}")
-                
-                # Mapear features a tracks
-                features_dict = {f['id']: f for f in features_batch if f and f.get('id')}
-                
-                # Añadir estadísticas a todas las canciones (con valores por defecto si no hay)
-                for track in tracks:
-                    if track.get('id') and track['id'] in features_dict:
-                        feat = features_dict[track['id']]
-                        track.update({
-                            'energia': round(feat.get('energy', 0) * 100, 1) if feat.get('energy') is not None else None,
-                            'danceability': round(feat.get('danceability', 0) * 100, 1) if feat.get('danceability') is not None else None,
-                            'valence': round(feat.get('valence', 0) * 100, 1) if feat.get('valence') is not None else None,
-                            'acousticness': round(feat.get('acousticness', 0) * 100, 1) if feat.get('acousticness') is not None else None,
-                            'instrumentalness': round(feat.get('instrumentalness', 0) * 100, 1) if feat.get('instrumentalness') is not None else None,
-                            'liveness': round(feat.get('liveness', 0) * 100, 1) if feat.get('liveness') is not None else None,
-                            'speechiness': round(feat.get('speechiness', 0) * 100, 1) if feat.get('speechiness') is not None else None,
-                            'tempo': round(feat.get('tempo', 0), 1) if feat.get('tempo') is not None else None,
-                            'key': feat.get('key'),
-                            'mode': 'Mayor' if feat.get('mode') == 1 else 'Menor' if feat.get('mode') == 0 else None,
-                            'time_signature': feat.get('time_signature')
-                        })
-                    else:
-                        # Añadir None para tracks sin features
-                        track.update({
-                            'energia': None, 'danceability': None, 'valence': None,
-                            'acousticness': None, 'instrumentalness': None, 'liveness': None,
-                            'speechiness': None, 'tempo': None, 'key': None,
-                            'mode': None, 'time_signature': None
-                        })
-    except Exception as e:
-        st.error(f"Error al cargar canciones guardadas: {str(e)}")
+    return _get_tracks(sp, _saved_page_fetcher(sp), 50, include_features,
+                       "Error al cargar canciones guardadas")
+
+
+# Caché entre reruns y sesiones de las descargas de la API, por token de usuario.
+# El cliente va con guion bajo para que Streamlit no intente hashearlo.
+# Los errores se propagan (st.cache_data no guarda excepciones): un fallo puntual
+# de la API no deja una lista vacía en caché durante el ttl.
+@st.cache_data(ttl=600, show_spinner=False)
+def _cached_user_playlists(_sp: spotipy.Spotify, token: str) -> List[Dict]:
+    return _fetch_user_playlists(_sp)
+
+
+# Las estadísticas de audio no se piden aquí: solo cuando el usuario las muestra (_tracks_with_features)
+@st.cache_data(ttl=600, show_spinner=False)
+def _cached_playlist_tracks(_sp: spotipy.Spotify, token: str, playlist_id: str) -> pd.DataFrame:
+    return _fetch_tracks(_sp, _playlist_page_fetcher(_sp, playlist_id), 100, include_features=False)
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def _cached_saved_tracks(_sp: spotipy.Spotify, token: str) -> pd.DataFrame:
+    return _fetch_tracks(_sp, _saved_page_fetcher(_sp), 50, include_features=False)
+
+
+def fetch_features_for(sp: spotipy.Spotify, df_tracks: pd.DataFrame) -> pd.DataFrame:
+    """
+    Añade las estadísticas de audio a canciones ya cargadas, sin volver a pedir las canciones
+    
+    Args:
+        sp: Cliente de Spotify autenticado
+        df_tracks: DataFrame de get_playlist_tracks / get_saved_tracks
+    
+    Returns:
+        Copia del DataFrame con las columnas de estadísticas
+    """
+    df_features = df_tracks.copy()
+    for column, values in _audio_feature_columns(sp, df_tracks['id'].tolist()).items():
+        df_features[column] = values
+    _shrink_feature_columns(df_features)
+    return df_features
+
+
+def _tracks_with_features(sp: spotipy.Spotify, state_key: str) -> Tuple[pd.DataFrame, str]:
+    """
+    Canciones de st.session_state[state_key], con estadísticas de audio salvo que el usuario las desactive
+    Las estadísticas se piden una vez por carga y se guardan en su propia clave ({state_key}_features)
+    
+    Returns:
+        (DataFrame a mostrar, clave de session_state en la que está)
+    """
+    if not st.toggle("📊 Mostrar estadísticas de audio", value=True, key=f"{state_key}_show_stats"):
+        return st.session_state[state_key], state_key
+    
+    features_key = f"{state_key}_features"
+    if features_key not in st.session_state:
+        with st.spinner("Cargando estadísticas de audio..."):
+            df_features = fetch_features_for(sp, st.session_state[state_key])
+        tracks_with_stats = int(df_features['energia'].notna().sum()) if 'energia' in df_features.columns else 0
+        if tracks_with_stats > 0:
+            st.success(f"✅ Estadísticas de audio obtenidas para {tracks_with_stats} de {len(df_features)} canciones")
+        else:
+            st.warning("⚠️ No se pudieron obtener estadísticas de audio")
+        st.session_state[features_key] = df_features
+    return st.session_state[features_key], features_key
+
+
+def _clear_derived_state(state_key: str):
+    """Borra lo calculado a partir de st.session_state[state_key] (descargas, medias, estadísticas de audio, página)"""
+    for suffix in ('_csv', '_parquet', '_ts', '_means', '_features', '_features_csv', '_features_parquet',
+                   '_features_ts', '_features_means', '_page'):
+        st.session_state.pop(f"{state_key}{suffix}", None)
+
+
+# Desde Streamlit 1.52 st.download_button acepta un callable que solo se ejecuta al pulsar
+DEFERRED_DOWNLOADS = tuple(int(part) for part in st.__version__.split('.')[:2]) >= (1, 52)
+
+
+# Formatos de descarga de las canciones: nombre -> (extensión, MIME, serializador)
+_DOWNLOAD_FORMATS = {
+    'CSV': ('csv', 'text/csv', lambda df: df_to_csv_bytes(df, float_format=None)),
+    'Parquet': ('parquet', 'application/vnd.apache.parquet',
+                lambda df: df_to_parquet_bytes(df, PARQUET_COMPRESSION, PARQUET_COMPRESSION_LEVEL)),
+}
+
+
+def _tracks_export(state_key: str, fmt: str) -> Union[bytes, Callable[[], bytes]]:
+    """
+    Canciones en st.session_state[state_key] serializadas en el formato fmt para st.download_button
+    Con descargas diferidas se devuelve un callable (no se genera si nadie descarga);
+    si no, se genera una sola vez por carga
+    """
+    ext, _, serialize = _DOWNLOAD_FORMATS[fmt]
+    if DEFERRED_DOWNLOADS:
+        df_tracks = st.session_state[state_key]
+        return lambda: serialize(df_tracks)
     
-    return tracks
+    export_key = f"{state_key}_{ext}"
+    if export_key not in st.session_state:
+        st.session_state[export_key] = serialize(st.session_state[state_key])
+    return st.session_state[export_key]
+
+
+def _render_tracks_download(state_key: str, file_stem: str):
+    """Selector de formato y botón de descarga de las canciones en st.session_state[state_key]"""
+    fmt = st.radio("Formato de descarga", list(_DOWNLOAD_FORMATS), horizontal=True,
+                   key=f"{file_stem}_download_format")
+    ext, mime, _ = _DOWNLOAD_FORMATS[fmt]
+    # Marca de tiempo fija por carga: el nombre del archivo no cambia en cada rerun
+    timestamp = st.session_state.setdefault(f"{state_key}_ts", int(time.time()))
+    st.download_button(
+        label=f"📥 Descargar {fmt}",
+        data=_tracks_export(state_key, fmt),
+        file_name=f"{file_stem}_{timestamp}.{ext}",
+        mime=mime
+    )
+
+
+# Estadísticas de audio que se muestran (medias y columnas de la tabla)
+STATS_COLUMNS = ['energia', 'danceability', 'valence', 'acousticness', 'tempo']
+
+
+def _stats_means(state_key: str, columns: List[str]) -> Dict[str, float]:
+    """Medias de las estadísticas de las canciones en st.session_state[state_key], calculadas una vez por carga"""
+    means_key = f"{state_key}_means"
+    if means_key not in st.session_state:
+        st.session_state[means_key] = st.session_state[state_key][columns].mean().to_dict()
+    return st.session_state[means_key]
+
+
+# Cabeceras de la tabla de canciones; las estadísticas con su formato numérico
+_BASE_COLUMN_CONFIG = {
+    'artista': 'Artista',
+    'titulo': 'Título',
+    'album': 'Álbum',
+    'duracion': 'Duración'
+}
+_STATS_COLUMN_FORMATS = {
+    'energia': ('⚡ Energía', "%.1f%%"),
+    'danceability': ('💃 Danceability', "%.1f%%"),
+    'valence': ('😊 Valence', "%.1f%%"),
+    'acousticness': ('🎸 Acousticness', "%.1f%%"),
+    'tempo': ('🎵 Tempo', "%.1f BPM"),
+}
+
+
+def _tracks_column_config(display_cols: List[str]) -> Dict:
+    """column_config de st.dataframe para las columnas mostradas de una tabla de canciones"""
+    column_config = dict(_BASE_COLUMN_CONFIG)
+    for column, (label, fmt) in _STATS_COLUMN_FORMATS.items():
+        if column in display_cols:
+            column_config[column] = st.column_config.NumberColumn(label, format=fmt)
+    return column_config
+
+
+def _render_stats_means(state_key: str, columns: List[str]):
+    """Una métrica por estadística de audio con su media (N/A si ninguna canción la tiene)"""
+    means = _stats_means(state_key, columns)
+    for col, stat_col in zip(st.columns(len(columns)), columns):
+        label, fmt = _STATS_COLUMN_FORMATS[stat_col]
+        avg = means[stat_col]
+        with col:
+            st.metric(label, fmt % avg if not pd.isna(avg) else "N/A")
+
+
+# Filas por página en las tablas de canciones: solo se envía al navegador la página visible
+TRACKS_PAGE_SIZE = 200
+
+
+def _tracks_page(df_tracks: pd.DataFrame, key: str) -> pd.DataFrame:
+    """Página visible de una tabla de canciones (el selector de página solo aparece si hay más de una)"""
+    n_pages = -(-len(df_tracks) // TRACKS_PAGE_SIZE)
+    if n_pages <= 1:
+        return df_tracks
+    page = st.number_input(f"Página (de {n_pages})", min_value=1, max_value=n_pages, value=1, step=1, key=key)
+    start = (int(page) - 1) * TRACKS_PAGE_SIZE
+    return df_tracks.iloc[start:start + TRACKS_PAGE_SIZE]
 
 
 def format_duration(ms: int) -> str:
@@ -334,6 +640,104 @@ def format_duration(ms: int) -> str:
     return f"{minutes}:{seconds:02d}"
 
 
+def format_durations(ms: pd.Series) -> pd.Series:
+    """Convierte una columna de milisegundos a formato mm:ss (divisiones vectorizadas)"""
+    minutes, seconds = divmod(ms.to_numpy() // 1000, 60)
+    return pd.Series([f"{m}:{s:02d}" for m, s in zip(minutes.tolist(), seconds.tolist())],
+                     index=ms.index, dtype=object)
+
+
+def _render_tracks_table(df_tracks: pd.DataFrame, state_key: str, tracks_key: str, file_stem: str):
+    """
+    Tabla paginada de canciones y su botón de descarga (común a playlists y canciones guardadas)
+    
+    Args:
+        df_tracks: Canciones a mostrar (con estadísticas de audio si están activadas)
+        state_key: Clave de session_state de las canciones cargadas (para la página)
+        tracks_key: Clave de session_state de df_tracks (para la descarga)
+        file_stem: Nombre base del archivo descargado
+    """
+    # Columnas base siempre visibles y estadísticas si existen en el DataFrame
+    base_cols = ['artista', 'titulo', 'album', 'duracion']
+    display_cols = base_cols + [col for col in STATS_COLUMNS if col in df_tracks.columns]
+    
+    # Tabla de canciones
+    st.markdown("### 🎵 Canciones")
+    st.dataframe(
+        _tracks_page(df_tracks, f"{state_key}_page")[display_cols],
+        use_container_width=True,
+        hide_index=True,
+        column_config=_tracks_column_config(display_cols)
+    )
+    
+    # Botón de descarga
+    _render_tracks_download(tracks_key, file_stem)
+
+
+# Desde Streamlit 1.37 st.fragment limita el rerun de los widgets de una función a esa función
+# (paginación, interruptor de estadísticas, descargas) sin volver a ejecutar toda la app
+_fragment = st.fragment if hasattr(st, 'fragment') else (lambda func: func)
+
+
+@_fragment
+def _render_playlist_tracks(sp: spotipy.Spotify, playlist_key: str, selected_playlist: str):
+    """Renderiza las canciones ya cargadas de una playlist (estadísticas, tabla y descarga)"""
+    df_tracks = st.session_state[playlist_key]
+    
+    if not df_tracks.empty:
+        df_tracks, tracks_key = _tracks_with_features(sp, playlist_key)
+        
+        # Mostrar estadísticas promedio solo si hay datos
+        available_stats = [col for col in STATS_COLUMNS if col in df_tracks.columns]
+        if available_stats:
+            st.markdown("### 📊 Estadísticas Promedio de la Playlist")
+            _render_stats_means(tracks_key, available_stats)
+        
+        _render_tracks_table(df_tracks, playlist_key, tracks_key,
+                             f"spotify_playlist_{selected_playlist.replace(' ', '_')}")
+    
+    if st.button("🔄 Recargar Canciones"):
+        _cached_playlist_tracks.clear()
+        if playlist_key in st.session_state:
+            del st.session_state[playlist_key]
+        st.rerun()
+
+
+@_fragment
+def _render_saved_tracks(sp: spotipy.Spotify):
+    """Renderiza las canciones guardadas ya cargadas (estadísticas, tabla y descarga)"""
+    df_tracks, tracks_key = _tracks_with_features(sp, 'spotify_saved_tracks')
+    
+    # Estadísticas generales
+    st.markdown("### 📊 Estadísticas Generales")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Total Canciones", len(df_tracks))
+    with col2:
+        st.metric("Artistas Únicos", df_tracks['artista'].cat.categories.size)
+    with col3:
+        total_duration = int(df_tracks['duracion_ms'].sum())
+        hours = total_duration // 3600000
+        minutes = (total_duration % 3600000) // 60000
+        st.metric("Duración Total", f"{hours}h {minutes}m")
+    with col4:
+        if 'album' in df_tracks.columns:
+            st.metric("Álbumes Únicos", df_tracks['album'].cat.categories.size)
+    
+    # Estadísticas promedio de audio
+    if any(col in df_tracks.columns for col in ['energia', 'danceability', 'valence']):
+        st.markdown("### 📊 Estadísticas Promedio de Audio")
+        _render_stats_means(tracks_key, [col for col in STATS_COLUMNS if col in df_tracks.columns])
+    
+    _render_tracks_table(df_tracks, 'spotify_saved_tracks', tracks_key, "spotify_saved_tracks")
+    
+    if st.button("🔄 Recargar Canciones"):
+        _cached_saved_tracks.clear()
+        if 'spotify_saved_tracks' in st.session_state:
+            del st.session_state['spotify_saved_tracks']
+        st.rerun()
+
+
 def render_spotify_tab(user_id: str):
     """Renderiza la pestaña de Spotify"""
     
@@ -534,9 +938,15 @@ def render_spotify_tab(user_id: str):
             if 'spotify_playlists' not in st.session_state:
                 if st.button("🔄 Cargar Playlists", type="primary"):
                     with st.spinner("Cargando playlists..."):
-                        playlists = get_user_playlists(sp)
+                        try:
+                            playlists = _cached_user_playlists(sp, st.session_state['spotify_token'])
+                        except Exception as e:
+                            st.error(f"Error al cargar playlists: {str(e)}")
+                            playlists = []
                         if playlists:
                             st.session_state['spotify_playlists'] = playlists
+                            # id -> nombre, para el selector (admite playlists con el mismo nombre)
+                            st.session_state['spotify_playlist_names'] = {p['id']: p['nombre'] for p in playlists}
                             st.success(f"✅ Encontradas {len(playlists)} playlists")
                             st.rerun()
             else:
@@ -556,116 +966,40 @@ def render_spotify_tab(user_id: str):
                 )
                 
                 # Selector de playlist para ver canciones
-                playlist_names = [p['nombre'] for p in playlists]
-                selected_playlist = st.selectbox("Selecciona una playlist para ver sus canciones:", playlist_names, key="spotify_playlist_selector")
+                playlist_names = st.session_state.get('spotify_playlist_names') or {p['id']: p['nombre'] for p in playlists}
+                playlist_id = st.selectbox("Selecciona una playlist para ver sus canciones:", list(playlist_names),
+                                           format_func=playlist_names.get, key="spotify_playlist_selector")
                 
-                if selected_playlist:
-                    playlist_id = next(p['id'] for p in playlists if p['nombre'] == selected_playlist)
+                if playlist_id:
+                    selected_playlist = playlist_names[playlist_id]
                     
                     # Cargar canciones si no están cargadas o si cambió la playlist
                     playlist_key = f"spotify_playlist_tracks_{playlist_id}"
                     if playlist_key not in st.session_state or st.session_state.get('spotify_selected_playlist_id') != playlist_id:
                         if st.button("🎵 Cargar Canciones", type="primary", key="load_playlist_tracks"):
-                            with st.spinner("Cargando canciones y estadísticas de audio..."):
-                                tracks = get_playlist_tracks(sp, playlist_id, include_features=True)
-                                if tracks:
-                                    # Formatear duración
-                                    for track in tracks:
-                                        track['duracion'] = format_duration(track['duracion_ms'])
-                                    
-                                    # Verificar si se obtuvieron estadísticas
-                                    tracks_with_stats = sum(1 for t in tracks if t.get('energia') is not None)
-                                    if tracks_with_stats > 0:
-                                        st.success(f"✅ Cargadas {len(tracks)} canciones con estadísticas de audio para {tracks_with_stats} canciones")
-                                    else:
-                                        st.warning(f"⚠️ Cargadas {len(tracks)} canciones, pero no se pudieron obtener estadísticas de audio")
+                            with st.spinner("Cargando canciones..."):
+                                try:
+                                    df_tracks = _cached_playlist_tracks(sp, st.session_state['spotify_token'], playlist_id)
+                                except Exception as e:
+                                    st.error(f"Error al cargar canciones: {str(e)}")
+                                    df_tracks = pd.DataFrame()
+                                if not df_tracks.empty:
+                                    # Formatear duración (por columna)
+                                    df_tracks['duracion'] = format_durations(df_tracks['duracion_ms'])
+                                    st.success(f"✅ Cargadas {len(df_tracks)} canciones")
                                     
-                                    st.session_state[playlist_key] = tracks
+                                    st.session_state[playlist_key] = df_tracks
+                                    _clear_derived_state(playlist_key)
                                     st.session_state['spotify_selected_playlist_id'] = playlist_id
                                     st.rerun()
                     else:
-                        tracks = st.session_state[playlist_key]
-                        
-                        if tracks:
-                            df_tracks = pd.DataFrame(tracks)
-                            
-                            # Columnas base siempre visibles
-                            base_cols = ['artista', 'titulo', 'album', 'duracion']
-                            
-                            # Columnas de estadísticas (mostrar si existen en el DataFrame)
-                            stats_cols = ['energia', 'danceability', 'valence', 'acousticness', 'tempo']
-                            available_stats = [col for col in stats_cols if col in df_tracks.columns]
-                            
-                            # Columnas a mostrar
-                            display_cols = base_cols + available_stats
-                            
-                            # Mostrar estadísticas promedio solo si hay datos
-                            if available_stats:
-                                st.markdown("### 📊 Estadísticas Promedio de la Playlist")
-                                cols = st.columns(min(len(available_stats), 5))
-                                for idx, stat_col in enumerate(available_stats[:5]):
-                                    with cols[idx]:
-                                        if stat_col == 'energia':
-                                            avg = df_tracks[stat_col].mean()
-                                            st.metric("⚡ Energía", f"{avg:.1f}%" if not pd.isna(avg) else "N/A")
-                                        elif stat_col == 'danceability':
-                                            avg = df_tracks[stat_col].mean()
-                                            st.metric("💃 Danceability", f"{avg:.1f}%" if not pd.isna(avg) else "N/A")
-                                        elif stat_col == 'valence':
-                                            avg = df_tracks[stat_col].mean()
-                                            st.metric("😊 Valence", f"{avg:.1f}%" if not pd.isna(avg) else "N/A")
-                                        elif stat_col == 'acousticness':
-                                            avg = df_tracks[stat_col].mean()
-                                            st.metric("🎸 Acousticness", f"{avg:.1f}%" if not pd.isna(avg) else "N/A")
-                                        elif stat_col == 'tempo':
-                                            avg = df_tracks[stat_col].mean()
-                                            st.metric("🎵 Tempo", f"{avg:.1f} BPM" if not pd.isna(avg) else "N/A")
-                            
-                            # Tabla de canciones
-                            st.markdown("### 🎵 Canciones")
-                            column_config = {
-                                'artista': 'Artista',
-                                'titulo': 'Título',
-                                'album': 'Álbum',
-                                'duracion': 'Duración'
-                            }
-                            
-                            # Añadir config para estadísticas
-                            if 'energia' in display_cols:
-                                column_config['energia'] = st.column_config.NumberColumn('⚡ Energía', format="%.1f%%")
-                            if 'danceability' in display_cols:
-                                column_config['danceability'] = st.column_config.NumberColumn('💃 Danceability', format="%.1f%%")
-                            if 'valence' in display_cols:
-                                column_config['valence'] = st.column_config.NumberColumn('😊 Valence', format="%.1f%%")
-                            if 'acousticness' in display_cols:
-                                column_config['acousticness'] = st.column_config.NumberColumn('🎸 Acousticness', format="%.1f%%")
-                            if 'tempo' in display_cols:
-                                column_config['tempo'] = st.column_config.NumberColumn('🎵 Tempo', format="%.1f BPM")
-                            
-                            st.dataframe(
-                                df_tracks[display_cols],
-                                use_container_width=True,
-                                hide_index=True,
-                                column_config=column_config
-                            )
-                            
-                            # Botón de descarga
-                            csv = df_tracks.to_csv(index=False).encode('utf-8-sig')
-                            st.download_button(
-                                label="📥 Descargar CSV",
-                                data=csv,
-                                file_name=f"spotify_playlist_{selected_playlist.replace(' ', '_')}_{int(time.time())}.csv",
-                                mime="text/csv"
-                            )
-                        
-                        if st.button("🔄 Recargar Canciones"):
-                            if playlist_key in st.session_state:
-                                del st.session_state[playlist_key]
-                            st.rerun()
+                        _render_playlist_tracks(sp, playlist_key, selected_playlist)
                 
                 if st.button("🔄 Recargar Playlists"):
+                    _cached_user_playlists.clear()
                     if 'spotify_playlists' in st.session_state:
                         del st.session_state['spotify_playlists']
+                    st.session_state.pop('spotify_playlist_names', None)
                     if 'spotify_selected_playlist_id' in st.session_state:
                         del st.session_state['spotify_selected_playlist_id']
                     st.rerun()
@@ -676,124 +1010,29 @@ def render_spotify_tab(user_id: str):
             # Cargar canciones si no están en session_state
             if 'spotify_saved_tracks' not in st.session_state:
                 if st.button("🔄 Cargar Canciones Guardadas", type="primary"):
-                    with st.spinner("Cargando canciones guardadas y estadísticas de audio..."):
-                        tracks = get_saved_tracks(sp, include_features=True)
-                        if tracks:
-                            # Formatear duración
-                            for track in tracks:
-                                track['duracion'] = format_duration(track['duracion_ms'])
-                            
-                            # Verificar si se obtuvieron estadísticas
-                            tracks_with_stats = sum(1 for t in tracks if t.get('energia') is not None)
-                            if tracks_with_stats > 0:
-                                st.success(f"✅ Cargadas {len(tracks)} canciones con estadísticas de audio para {tracks_with_stats} canciones")
-                            else:
-                                st.warning(f"⚠️ Cargadas {len(tracks)} canciones, pero no se pudieron obtener estadísticas de audio")
+                    with st.spinner("Cargando canciones guardadas..."):
+                        try:
+                            df_tracks = _cached_saved_tracks(sp, st.session_state['spotify_token'])
+                        except Exception as e:
+                            st.error(f"Error al cargar canciones guardadas: {str(e)}")
+                            df_tracks = pd.DataFrame()
+                        if not df_tracks.empty:
+                            # Formatear duración (por columna)
+                            df_tracks['duracion'] = format_durations(df_tracks['duracion_ms'])
+                            st.success(f"✅ Cargadas {len(df_tracks)} canciones")
                             
-                            st.session_state['spotify_saved_tracks'] = tracks
+                            st.session_state['spotify_saved_tracks'] = df_tracks
+                            _clear_derived_state('spotify_saved_tracks')
                             st.rerun()
             else:
-                tracks = st.session_state['spotify_saved_tracks']
-                df_tracks = pd.DataFrame(tracks)
-                
-                # Estadísticas generales
-                st.markdown("### 📊 Estadísticas Generales")
-                col1, col2, col3, col4 = st.columns(4)
-                with col1:
-                    st.metric("Total Canciones", len(tracks))
-                with col2:
-                    st.metric("Artistas Únicos", df_tracks['artista'].nunique())
-                with col3:
-                    total_duration = sum(t['duracion_ms'] for t in tracks)
-                    hours = total_duration // 3600000
-                    minutes = (total_duration % 3600000) // 60000
-                    st.metric("Duración Total", f"{hours}h {minutes}m")
-                with col4:
-                    if 'album' in df_tracks.columns:
-                        st.metric("Álbumes Únicos", df_tracks['album'].nunique())
-                
-                # Estadísticas promedio de audio
-                if any(col in df_tracks.columns for col in ['energia', 'danceability', 'valence']):
-                    st.markdown("### 📊 Estadísticas Promedio de Audio")
-                    col1, col2, col3, col4, col5 = st.columns(5)
-                    with col1:
-                        if 'energia' in df_tracks.columns:
-                            avg_energy = df_tracks['energia'].mean()
-                            st.metric("⚡ Energía", f"{avg_energy:.1f}%")
-                    with col2:
-                        if 'danceability' in df_tracks.columns:
-                            avg_dance = df_tracks['danceability'].mean()
-                            st.metric("💃 Danceability", f"{avg_dance:.1f}%")
-                    with col3:
-                        if 'valence' in df_tracks.columns:
-                            avg_valence = df_tracks['valence'].mean()
-                            st.metric("😊 Valence", f"{avg_valence:.1f}%")
-                    with col4:
-                        if 'acousticness' in df_tracks.columns:
-                            avg_acoustic = df_tracks['acousticness'].mean()
-                            st.metric("🎸 Acousticness", f"{avg_acoustic:.1f}%")
-                    with col5:
-                        if 'tempo' in df_tracks.columns:
-                            avg_tempo = df_tracks['tempo'].mean()
-                            st.metric("🎵 Tempo", f"{avg_tempo:.1f} BPM")
-                
-                # Columnas base siempre visibles
-                base_cols = ['artista', 'titulo', 'album', 'duracion']
-                
-                # Columnas de estadísticas (mostrar si existen en el DataFrame)
-                stats_cols = ['energia', 'danceability', 'valence', 'acousticness', 'tempo']
-                available_stats = [col for col in stats_cols if col in df_tracks.columns]
-                
-                # Columnas a mostrar
-                display_cols = base_cols + available_stats
-                
-                # Tabla de canciones
-                st.markdown("### 🎵 Canciones")
-                column_config = {
-                    'artista': 'Artista',
-                    'titulo': 'Título',
-                    'album': 'Álbum',
-                    'duracion': 'Duración'
-                }
-                
-                # Añadir config para estadísticas
-                if 'energia' in display_cols:
-                    column_config['energia'] = st.column_config.NumberColumn('⚡ Energía', format="%.1f%%")
-                if 'danceability' in display_cols:
-                    column_config['danceability'] = st.column_config.NumberColumn('💃 Danceability', format="%.1f%%")
-                if 'valence' in display_cols:
-                    column_config['valence'] = st.column_config.NumberColumn('😊 Valence', format="%.1f%%")
-                if 'acousticness' in display_cols:
-                    column_config['acousticness'] = st.column_config.NumberColumn('🎸 Acousticness', format="%.1f%%")
-                if 'tempo' in display_cols:
-                    column_config['tempo'] = st.column_config.NumberColumn('🎵 Tempo', format="%.1f BPM")
-                
-                st.dataframe(
-                    df_tracks[display_cols],
-                    use_container_width=True,
-                    hide_index=True,
-                    column_config=column_config
-                )
-                
-                # Botón de descarga
-                csv = df_tracks.to_csv(index=False).encode('utf-8-sig')
-                st.download_button(
-                    label="📥 Descargar CSV",
-                    data=csv,
-                    file_name=f"spotify_saved_tracks_{int(time.time())}.csv",
-                    mime="text/csv"
-                )
-                
-                if st.button("🔄 Recargar Canciones"):
-                    if 'spotify_saved_tracks' in st.session_state:
-                        del st.session_state['spotify_saved_tracks']
-                    st.rerun()
+                _render_saved_tracks(sp)
         
         # Botón para desconectar
         st.markdown("---")
         if st.button("🚪 Desconectar"):
             keys_to_delete = [
-                'spotify_token', 'spotify_refresh_token', 
+                'spotify_token', 'spotify_refresh_token', 'spotify_token_info',
+                'spotify_client', 'spotify_client_token',
                 'spotify_auth_manager', 'spotify_client_id', 
                 'spotify_client_secret', 'spotify_auth_url'
             ]
@@ -0,0 +1,51 @@
+import pandas as pd
+
+from rekordbox_module import find_matches_with_progress
+
+
+def _matches(rekordbox_df, discos_df, **kwargs):
+    # La última actualización del generador trae el DataFrame de resultados
+    *_, (_, matches_df, _) = find_matches_with_progress(rekordbox_df, discos_df, **kwargs)
+    return matches_df
+
+
+def _discos(artistas, titulos):
+    return pd.DataFrame({
+        'artista': artistas,
+        'titulo': titulos,
+        'precio': ['10€'] * len(artistas),
+        'estilos': ['Techno'] * len(artistas),
+    })
+
+
+def test_article_prefixes_match_with_default_options():
+    rekordbox_df = pd.DataFrame({'artista': ['The Prodigy', 'DJ Koze'], 'titulo': ['Firestarter', 'Pick Up']})
+    discos_df = _discos(['Prodigy', 'Koze', 'Someone Else'], ['Firestarter', 'Pick Up', 'Other Track'])
+    
+    matches_df = _matches(rekordbox_df, discos_df)
+    
+    assert sorted(zip(matches_df['artista_rekordbox'], matches_df['artista_disco'])) == [
+        ('DJ Koze', 'Koze'), ('The Prodigy', 'Prodigy')
+    ]
+
+
+def test_strong_title_matches_with_partial_artist():
+    # Artista al 67% (por debajo del umbral de 0.7) pero título idéntico: pareja de "título fuerte"
+    rekordbox_df = pd.DataFrame({'artista': ['Jeff Mills'], 'titulo': ['The Bells']})
+    discos_df = _discos(['Mills', 'Robert Hood'], ['The Bells', 'Minus'])
+    
+    matches_df = _matches(rekordbox_df, discos_df)
+    
+    assert matches_df['artista_disco'].tolist() == ['Mills']
+
+
+def test_discs_without_stored_norm_still_match():
+    # Discos antiguos sin *_norm concatenados con discos nuevos que sí lo tienen
+    rekordbox_df = pd.DataFrame({'artista': ['Jeff Mills'], 'titulo': ['The Bells']})
+    discos_df = _discos(['Jeff Mills', 'Robert Hood'], ['The Bells', 'Minus'])
+    discos_df['artista_norm'] = [None, 'robert hood']
+    discos_df['titulo_norm'] = [None, 'minus']
+    
+    matches_df = _matches(rekordbox_df, discos_df)
+    
+    assert matches_df['artista_disco'].tolist() == ['Jeff Mills']
@@ -3,6 +3,13 @@ Utilidades compartidas para NoTechnoTempo
 Estilos, logo y funciones comunes
 """
 
+import functools
+import io
+import re
+import unicodedata
+from typing import Optional
+
+import pandas as pd
 import streamlit as st
 
 
@@ -452,3 +459,184 @@ def render_card(title: str, icon: str = "", content: str = ""):
         {content}
     </div>
     """
+
+
+# Expresiones de normalización compiladas una sola vez
+_RE_PUNCT = re.compile(r'[^\w\s]')
+_RE_WS = re.compile(r'\s+')
+
+# Mismo filtro que _RE_PUNCT para texto ASCII, como tabla de str.translate
+_ASCII_PUNCT_TABLE = {
+    i: None for i in range(128)
+    if not (chr(i).isalnum() or chr(i) == '_' or chr(i).isspace())
+}
+
+
+# Cacheada: los mismos artistas se repiten en muchos discos y pistas
+@functools.lru_cache(maxsize=200_000)
+def normalize_text(text: str) -> str:
+    """
+    Normaliza texto para comparación
+    
+    Descompone acentos (NFKD), pasa a minúsculas, elimina caracteres
+    especiales y normaliza espacios.
+    """
+    if not text:
+        return ""
+    text = unicodedata.normalize('NFKD', str(text)).lower()
+    # Remover caracteres especiales comunes (incluye las marcas de acento separadas);
+    # el texto ASCII, el caso habitual, se filtra con str.translate en una pasada
+    if text.isascii():
+        text = text.translate(_ASCII_PUNCT_TABLE)
+    else:
+        text = _RE_PUNCT.sub('', text)
+    # Normalizar espacios
+    return ' '.join(text.split())
+
+
+def normalize_series(series: pd.Series) -> pd.Series:
+    """
+    Versión vectorizada de normalize_text para columnas de pandas
+    
+    Args:
+        series: Serie con textos (artistas, títulos...)
+    
+    Returns:
+        Serie con los textos normalizados
+    """
+    # Normalizar solo los valores distintos (los artistas se repiten mucho)
+    codigos, unicos = pd.factorize(series.fillna('').astype(str))
+    # dtype object: fuerza el motor `re` de Python (con pyarrow, \w sería solo ASCII)
+    normalizados = (
+        pd.Series(unicos, dtype=object)
+        .str.normalize('NFKD')
+        .str.lower()
+        .str.replace(_RE_PUNCT, '', regex=True)
+        .str.replace(_RE_WS, ' ', regex=True)
+        .str.strip()
+    )
+    return pd.Series(normalizados.to_numpy(dtype=object)[codigos], index=series.index,
+                     name=series.name, dtype=object)
+
+
+def add_normalized_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Añade las columnas artista_norm y titulo_norm usadas por el buscador
+    
+    Args:
+        df: DataFrame con columnas artista y titulo
+    
+    Returns:
+        Copia del DataFrame con las columnas normalizadas
+    """
+    df = df.copy()
+    for col in ('artista', 'titulo'):
+        if col in df.columns:
+            df[f'{col}_norm'] = normalize_series(df[col])
+    return df
+
+
+def count_with_text(df: pd.DataFrame) -> int:
+    """
+    Cuenta las filas con artista o título no vacío (las que entran en el buscador)
+    
+    Args:
+        df: DataFrame con columnas artista y/o titulo
+    
+    Returns:
+        Número de filas comparables
+    """
+    if df is None or df.empty:
+        return 0
+    con_texto = pd.Series(False, index=df.index)
+    for col in ('artista', 'titulo'):
+        if col in df.columns:
+            con_texto |= df[col].fillna('').astype(str).str.strip() != ''
+    return int(con_texto.sum())
+
+
+def parse_price(precio) -> Optional[float]:
+    """
+    Convierte un precio en texto (ej: '12,99€') a número
+    
+    Returns:
+        Precio como float, o None si no es un precio válido ('N/A', sin €...)
+    """
+    if not isinstance(precio, str) or '€' not in precio:
+        return None
+    try:
+        return float(precio.replace('€', '').replace(',', '.').strip())
+    except ValueError:
+        return None
+
+
+def parse_prices(series: pd.Series) -> pd.Series:
+    """
+    Versión vectorizada de parse_price para columnas de pandas
+    
+    Args:
+        series: Serie con los precios tal como se scrapearon
+    
+    Returns:
+        Serie float con los precios (NaN si no son válidos)
+    """
+    precios = series.astype(str)
+    numeros = pd.to_numeric(
+        precios.str.replace('€', '', regex=False).str.replace(',', '.', regex=False).str.strip(),
+        errors='coerce'
+    )
+    return numeros.where(precios.str.contains('€', regex=False))
+
+
+def sum_prices(series: pd.Series) -> float:
+    """
+    Suma una columna de precios en texto (ej: '12,99€')
+    
+    Args:
+        series: Serie con los precios tal como se scrapearon
+    
+    Returns:
+        Suma de los precios válidos (se ignoran 'N/A' y valores sin €)
+    """
+    return float(parse_prices(series).sum())
+
+
+def df_to_csv_bytes(df: pd.DataFrame, float_format: Optional[str] = '%.3f') -> bytes:
+    """
+    Serializa un DataFrame a CSV (UTF-8 con BOM, para Excel) para st.download_button
+    
+    Escribe directamente en un buffer binario en lugar de generar un str
+    y codificarlo después, evitando una copia completa en memoria.
+    
+    Args:
+        df: DataFrame a exportar
+        float_format: Formato de las columnas numéricas decimales (None = formato por defecto de pandas)
+    
+    Returns:
+        Bytes del CSV
+    """
+    buffer = io.BytesIO()
+    df.to_csv(buffer, index=False, encoding='utf-8-sig', float_format=float_format)
+    return buffer.getvalue()
+
+
+def df_to_parquet_bytes(df: pd.DataFrame, compression: str = 'zstd',
+                        compression_level: Optional[int] = None) -> bytes:
+    """
+    Serializa un DataFrame a Parquet para st.download_button
+    
+    Columnar y comprimido: mucho más rápido de generar y más pequeño que el CSV
+    en tablas anchas de columnas numéricas.
+    
+    Args:
+        df: DataFrame a exportar
+        compression: Códec de compresión de Parquet
+        compression_level: Nivel de compresión (None = el del códec por defecto)
+    
+    Returns:
+        Bytes del archivo Parquet
+    """
+    buffer = io.BytesIO()
+    df.to_parquet(buffer, engine='pyarrow', index=False,
+                  compression=compression, compression_level=compression_level)
+    return buffer.getvalue()